@@ -0,0 +1,322 @@
+# Treason benchmarks
+# times the parts of a frame (events, update, collisions and rendering) in
+# game states built for chosen levels and bullet counts, writes the results as
+# JSON and compares them to a saved baseline. With --startup it also times
+# how long the game takes from a cold start to its first frame.
+#
+# usage: python benchmark.py --output results.json
+#        python benchmark.py --baseline results.json
+#        python benchmark.py --startup --output results.json
+#        python benchmark.py --checkpoint late_level.checkpoint
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# benchmarks always run without a real window
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+import treason
+
+
+# User-defined functions
+
+def main():
+    parser = argparse.ArgumentParser(description='time the parts of a treason frame')
+    parser.add_argument('--scenario', action='append', metavar='LEVEL:PLAYER_BULLETS:ENEMY_BULLETS',
+                        help='a game state to time, can be given more than once '
+                             '(default: {})'.format(' '.join(DEFAULT_SCENARIOS)))
+    parser.add_argument('--frames', type=int, default=300, help='frames to time per scenario')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='game',
+                        help='which kind of Game to time')
+    parser.add_argument('--seed', type=int, default=1, help='seed of every scenario')
+    parser.add_argument('--checkpoint', action='append', metavar='PATH',
+                        help='also time the game saved in a checkpoint file (from treason.py --save); '
+                             'can be given more than once')
+    parser.add_argument('--output', metavar='PATH', help='write the results as JSON to PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='compare the results to a JSON file from --output')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='how much slower than the baseline counts as a regression (default 0.2 for 20%%)')
+    parser.add_argument('--startup', action='store_true', help='also time cold starts up to the first frame')
+    parser.add_argument('--startup-runs', type=int, default=10, help='cold starts to time for each stage')
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.font.init()
+    surface = pygame.display.set_mode((1000, 800))
+
+    results = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'backend': args.backend,
+        'frames': args.frames,
+        'scenarios': {},
+    }
+    for scenario in args.scenario or DEFAULT_SCENARIOS:
+        level, player_bullets, enemy_bullets = [int(part) for part in scenario.split(':')]
+        game = build_game(BACKENDS[args.backend], surface, level, player_bullets, enemy_bullets, args.seed)
+        result = time_frames(game, args.frames)
+        results['scenarios'][scenario] = result
+        print_result(scenario, result)
+    for path in args.checkpoint or []:
+        game = BACKENDS[args.backend](surface, seed=args.seed)
+        game.load_checkpoint(path)
+        result = time_frames(game, args.frames)
+        results['scenarios'][path] = result
+        print_result(path, result)
+    pygame.quit()
+
+    results['entity'] = time_entities(args.seed)
+    print('Dot  {:.0f} bytes each  {:.0f} ns per check_bullet_shot'.format(
+        results['entity']['bytes_per_dot'], results['entity']['ns_per_collision_check']))
+
+    if args.startup:
+        results['startup'] = time_startup(args.startup_runs)
+        print('startup  ' + '   '.join('{} p50 {:.1f} ms'.format(stage, results['startup'][stage]['p50_ms'])
+                                       for stage in STARTUP_STAGES))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        # timings of another backend or frame count are not comparable
+        for setting in ('backend', 'frames'):
+            if baseline.get(setting) != results[setting]:
+                print('cannot compare to {}: it was run with {} {}, not {}'.format(
+                    args.baseline, setting, baseline.get(setting), results[setting]))
+                sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+        print('no regressions against ' + args.baseline)
+
+
+def build_game(game_class, surface, level, player_bullets, enemy_bullets, seed):
+    # Return a game in play at level with the given numbers of bullets flying
+    # - game_class is Game or ArrayGame
+    # - surface is the display surface
+    # - level is the int level, which decides number_enemies
+    # - player_bullets and enemy_bullets are how many bullets of each kind to add
+    # - seed is the seed of the game's random numbers
+    game = game_class(surface, seed=seed)
+    game.handle_key(pygame.K_m)
+    game.level = level
+    game.number_enemies = 10 + game.enemies_per_level * (level - 1)
+    game.create_enemies()
+    add_bullets(game, player_bullets, enemy_bullets)
+    return game
+
+
+def add_bullets(game, player_bullets, enemy_bullets):
+    # Fire bullets from random places in random directions until game has
+    # player_bullets and enemy_bullets of each kind
+    # - game is the Game to add bullets to
+    width, height = game.surface_size
+    rng = game.random
+    player_count, enemy_count = count_bullets(game)
+    for status, wanted, count, speed in ((treason.PLAYER_BULLET, player_bullets, player_count, 12),
+                                         (treason.ENEMY_BULLET, enemy_bullets, enemy_count, 9)):
+        for i in range(wanted - count):
+            velocity = rng.choice([[-speed, 0], [speed, 0], [0, -speed], [0, speed]])
+            center = [rng.randint(0, width), rng.randint(0, height)]
+            game.shoot(rng.choice(treason.TEAM_COLORS), center, velocity, status)
+
+
+def count_bullets(game):
+    # Return how many player bullets and enemy bullets game has
+    # - game is the Game to count in
+    if isinstance(game, treason.ArrayGame):
+        status = game.dots.status[:game.dots.count]
+        return (int((status == treason.Status.PLAYER_BULLET).sum()),
+                int((status == treason.Status.ENEMY_BULLET).sum()))
+    return len(game.player_bullets), len(game.enemy_bullets)
+
+
+def time_frames(game, frames):
+    # Play frames frames of game the way Game.play does, timing each part of
+    # every frame, and return the timing summary. Every frame starts from the
+    # game as it was given, with full lives, restored from save_state, so no
+    # enemy stays shot, no bullet count runs down and the level never changes;
+    # only the frame counter moves on, so enemies still turn and aim on their
+    # own frames.
+    # - game is the Game to time
+    game.game_lives = game.max_lives
+    game.continue_game = True
+    scenario = game.save_state()
+    first_frame = game.frame_counter
+    player_bullets, enemy_bullets = count_bullets(game)
+    live_enemies = 0
+    timings = {phase: [] for phase in PHASES}
+    perf_counter = time.perf_counter
+    for i in range(frames):
+        game.load_state(scenario)
+        game.frame_counter = first_frame + i
+        live_enemies += game.count_entities()[0] - 1
+
+        start = perf_counter()
+        game.handle_events()
+        events_done = perf_counter()
+        game.check_collisions()
+        collisions_done = perf_counter()
+        game.update_entities()
+        game.decide_continue()
+        update_done = perf_counter()
+        game.draw()
+        game.present()
+        render_done = perf_counter()
+
+        timings['handle_events'].append(events_done - start)
+        timings['collisions'].append(collisions_done - events_done)
+        timings['update'].append(update_done - collisions_done)
+        timings['render'].append(render_done - update_done)
+        timings['frame'].append(render_done - start)
+
+    result = {phase: summarize(times) for phase, times in timings.items()}
+    result['fps'] = frames / sum(timings['frame'])
+    result['enemies'] = live_enemies / frames
+    result['player_bullets'] = player_bullets
+    result['enemy_bullets'] = enemy_bullets
+    return result
+
+
+def time_entities(seed, count=20000, bullets=200, enemies=200, repeats=5):
+    # Return how many bytes one enemy Dot takes and how many nanoseconds one
+    # bullet-against-enemy check_bullet_shot takes, on the best of repeats runs
+    # - seed is the seed of the random positions
+    rng = random.Random(seed)
+    colors = treason.TEAM_COLORS
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    dots = []
+    for i in range(count):
+        color = colors[i % 3]
+        dots.append(treason.Dot(color, color, 9, [rng.randint(0, 1000), rng.randint(0, 800)],
+                                [3, 0], treason.ENEMY))
+    used = tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(dots)
+    tracemalloc.stop()
+
+    # bullets and enemies crowded together so about a third of the checks hit
+    bullet_dots = []
+    for i in range(bullets):
+        color = colors[i % 3]
+        bullet_dots.append(treason.Dot(color, color, 5, [rng.randint(0, 60), rng.randint(0, 60)],
+                                       [12, 0], treason.PLAYER_BULLET))
+    enemy_dots = []
+    for i in range(enemies):
+        color = colors[rng.randrange(3)]
+        enemy_dots.append(treason.Dot(color, color, 9, [rng.randint(0, 60), rng.randint(0, 60)],
+                                      [3, 0], treason.ENEMY))
+    best = None
+    for repeat in range(repeats):
+        lives = 5
+        start = time.perf_counter()
+        for bullet in bullet_dots:
+            for enemy in enemy_dots:
+                lives = bullet.check_bullet_shot(enemy, lives)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return {
+        'bytes_per_dot': used / count,
+        'ns_per_collision_check': best / (bullets * enemies) * 1e9,
+    }
+
+
+def time_startup(runs):
+    # Return the timing summary of runs cold starts of each of STARTUP_STAGES,
+    # each in a new Python process: starting Python alone, importing treason,
+    # and running treason.py until it has drawn its first frame and quit
+    # - runs is how many times to start each stage
+    directory = os.path.dirname(os.path.abspath(__file__))
+    commands = {
+        'interpreter': [sys.executable, '-c', 'pass'],
+        'import': [sys.executable, '-c', 'import treason'],
+        'first_frame': [sys.executable, os.path.join(directory, 'treason.py'), '--frames', '1'],
+    }
+    result = {}
+    for stage in STARTUP_STAGES:
+        times = []
+        for i in range(runs):
+            start = time.perf_counter()
+            subprocess.run(commands[stage], cwd=directory, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start)
+        result[stage] = summarize(times)
+    return result
+
+
+def summarize(times):
+    # Return the mean, 50th and 99th percentile of times in milliseconds
+    # - times is a list of float seconds
+    ordered = sorted(times)
+    return {
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+    }
+
+
+def percentile(ordered, percent):
+    # Return the value below which percent percent of the sorted list ordered falls
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_result(scenario, result):
+    # Print one line per phase of a scenario's results
+    print('{}  ({:.0f} enemies, {} player bullets, {} enemy bullets)  {:.0f} fps'.format(
+        scenario, result['enemies'], result['player_bullets'], result['enemy_bullets'], result['fps']))
+    for phase in PHASES:
+        print('  {:<14} p50 {:8.3f} ms   p99 {:8.3f} ms'.format(
+            phase, result[phase]['p50_ms'], result[phase]['p99_ms']))
+
+
+def compare(results, baseline, tolerance):
+    # Return a list of descriptions of every phase of every scenario whose
+    # p50 time is more than tolerance slower than in baseline
+    regressions = []
+    for scenario, result in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(scenario)
+        if old is None:
+            continue
+        for phase in PHASES:
+            old_time = old[phase]['p50_ms']
+            new_time = result[phase]['p50_ms']
+            # ignore phases too short to time reliably
+            if new_time > old_time * (1 + tolerance) and new_time - old_time > 0.01:
+                regressions.append('{} {}: p50 {:.3f} ms, was {:.3f} ms'.format(
+                    scenario, phase, new_time, old_time))
+    old_startup = baseline.get('startup')
+    if old_startup is not None and 'startup' in results:
+        for stage in STARTUP_STAGES:
+            old_time = old_startup[stage]['p50_ms']
+            new_time = results['startup'][stage]['p50_ms']
+            if new_time > old_time * (1 + tolerance):
+                regressions.append('startup {}: p50 {:.1f} ms, was {:.1f} ms'.format(stage, new_time, old_time))
+    old_entity = baseline.get('entity')
+    if old_entity is not None and 'entity' in results:
+        for measure in ('bytes_per_dot', 'ns_per_collision_check'):
+            if results['entity'][measure] > old_entity[measure] * (1 + tolerance):
+                regressions.append('Dot {}: {:.0f}, was {:.0f}'.format(
+                    measure, results['entity'][measure], old_entity[measure]))
+    return regressions
+
+
+PHASES = ['handle_events', 'collisions', 'update', 'render', 'frame']
+DEFAULT_SCENARIOS = ['1:10:20', '5:50:100', '10:150:300', '30:150:1000']
+STARTUP_STAGES = ['interpreter', 'import', 'first_frame']
+BACKENDS = {'game': treason.Game, 'array': treason.ArrayGame}
+
+
+if __name__ == '__main__':
+    main()
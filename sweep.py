@@ -0,0 +1,179 @@
+# Treason balance sweeps
+# plays many seeded games without a window, with a scripted or random player,
+# for every combination of the balance settings given, spread over all cores,
+# and saves how far the player got as JSON
+#
+# usage: python sweep.py --episodes 1000 --fire-cadence 5 10 20 --output sweep.json
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# the workers never open a window or need the pygame banner
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import treason
+
+
+# User-defined functions
+
+def main():
+    parser = argparse.ArgumentParser(description='play many treason games for each set of balance settings')
+    parser.add_argument('--episodes', type=int, default=200, help='games to play for each set of settings')
+    parser.add_argument('--max-frames', type=int, default=20000, help='the most frames each game can last')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='scripted', help='how the player plays')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game; the rest count up from it')
+    parser.add_argument('--fire-cadence', type=int, nargs='+', default=[10],
+                        help='frames between shots of an enemy that sees the player')
+    parser.add_argument('--random-fire-odds', type=int, nargs='+', default=[500],
+                        help='an enemy fires at random with 1 in this + 1 odds each frame')
+    parser.add_argument('--enemies-per-level', type=int, nargs='+', default=[5],
+                        help='how many more enemies each level has')
+    parser.add_argument('--max-lives', type=int, nargs='+', default=[9], help='lives at the start of each level')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes to play games in')
+    parser.add_argument('--output', metavar='PATH', default='sweep.json', help='where to save the results')
+    args = parser.parse_args()
+
+    settings_list = []
+    for values in itertools.product(args.fire_cadence, args.random_fire_odds,
+                                    args.enemies_per_level, args.max_lives):
+        settings_list.append(dict(zip(SETTINGS, values)))
+    jobs = []
+    for settings in settings_list:
+        for episode in range(args.episodes):
+            jobs.append((settings, args.seed + episode, args.policy, args.max_frames))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        episodes = list(executor.map(play_episode, jobs, chunksize=max(1, len(jobs) // (args.workers * 8))))
+    seconds = time.perf_counter() - start
+
+    results = {
+        'policy': args.policy,
+        'episodes_per_setting': args.episodes,
+        'max_frames': args.max_frames,
+        'seconds': seconds,
+        'results': [],
+    }
+    for i in range(len(settings_list)):
+        group = episodes[i * args.episodes:(i + 1) * args.episodes]
+        summary = aggregate(settings_list[i], group)
+        results['results'].append(summary)
+        print('{}  level {:.2f} (max {})  frames {:.0f}'.format(
+            ' '.join('{}={}'.format(name, value) for name, value in settings_list[i].items()),
+            summary['mean_level'], summary['max_level'], summary['mean_frames']))
+    print('{} games in {:.1f} s'.format(len(jobs), seconds))
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+
+def play_episode(job):
+    # Play one game without a window and return how it went: the level
+    # reached, the frames survived, and the lives every LIVES_INTERVAL frames
+    # - job is a (settings, seed, policy, max_frames) tuple
+    settings, seed, policy_name, max_frames = job
+    game = treason.Game(seed=seed)
+    for name, value in settings.items():
+        setattr(game, name, value)
+    game.game_lives = game.max_lives
+    policy = POLICIES[policy_name]
+    policy_random = random.Random(seed)
+    lives = []
+    game.handle_key(pygame.K_m)
+    while game.frame_counter < max_frames and game.continue_game:
+        if game.frame_counter % DECISION_INTERVAL == 0:
+            for key in policy(game, policy_random):
+                game.handle_key(key)
+        if game.frame_counter % LIVES_INTERVAL == 0:
+            lives.append(game.game_lives)
+        game.update()
+        game.decide_continue()
+    return {'level': game.level, 'frames': game.frame_counter, 'lives': lives}
+
+
+def random_policy(game, rng):
+    # Return the keys of a player pressing random keys
+    # - game is the Game being played
+    # - rng is the policy's random.Random
+    return [rng.choice(PLAY_KEYS)]
+
+
+def scripted_policy(game, rng):
+    # Return the keys of a player that turns the color of the nearest enemy,
+    # lines up with it and shoots
+    # - game is the Game being played
+    # - rng is the policy's random.Random
+    player = game.player_dot
+    x = player.x
+    y = player.y
+    target = None
+    target_distance = 0
+    for enemy in game.enemy_dots:
+        if not enemy.shot_yes:
+            distance = abs(enemy.x - x) + abs(enemy.y - y)
+            if target is None or distance < target_distance:
+                target = enemy
+                target_distance = distance
+    if target is None:
+        return []
+    keys = [COLOR_KEYS[target.team]]
+    dx = target.x - x
+    dy = target.y - y
+    if abs(dy) <= target.radius:
+        # in the same row, so face it and shoot
+        keys.append(pygame.K_RIGHT if dx > 0 else pygame.K_LEFT)
+        keys.append(pygame.K_SPACE)
+    elif abs(dx) <= target.radius:
+        # in the same column
+        keys.append(pygame.K_DOWN if dy > 0 else pygame.K_UP)
+        keys.append(pygame.K_SPACE)
+    else:
+        # move to the target's row
+        keys.append(pygame.K_DOWN if dy > 0 else pygame.K_UP)
+    return keys
+
+
+def aggregate(settings, episodes):
+    # Return the summary of a list of play_episode results for one set of settings
+    levels = [episode['level'] for episode in episodes]
+    frames = [episode['frames'] for episode in episodes]
+    # average lives at each sample time, counting finished games as 0 lives
+    samples = max(len(episode['lives']) for episode in episodes)
+    lives_over_time = []
+    for i in range(samples):
+        total = 0
+        for episode in episodes:
+            if i < len(episode['lives']):
+                total += episode['lives'][i]
+        lives_over_time.append(total / len(episodes))
+    return {
+        'settings': settings,
+        'episodes': len(episodes),
+        'mean_level': statistics.mean(levels),
+        'median_level': statistics.median(levels),
+        'max_level': max(levels),
+        'level_counts': {str(level): levels.count(level) for level in sorted(set(levels))},
+        'mean_frames': statistics.mean(frames),
+        'median_frames': statistics.median(frames),
+        'lives_interval_frames': LIVES_INTERVAL,
+        'mean_lives_over_time': lives_over_time,
+    }
+
+
+SETTINGS = ['enemy_fire_cadence', 'random_fire_odds', 'enemies_per_level', 'max_lives']
+POLICIES = {'random': random_policy, 'scripted': scripted_policy}
+PLAY_KEYS = [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT,
+             pygame.K_SPACE, pygame.K_x, pygame.K_c, pygame.K_v]
+COLOR_KEYS = [pygame.K_x, pygame.K_v, pygame.K_c]  # in the order of treason.Team
+DECISION_INTERVAL = 5  # frames between the player's decisions
+LIVES_INTERVAL = 60  # frames between samples of the lives
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# Tests for treason.py, run with python -m pytest
+import os
+import random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pytest
+
+import treason
+
+needs_numpy = pytest.mark.skipif(treason.numpy is None, reason='ArrayGame needs numpy')
+GAME_CLASSES = [treason.Game, pytest.param(treason.ArrayGame, marks=needs_numpy)]
+KEYS = [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE,
+        pygame.K_x, pygame.K_c, pygame.K_v]
+
+
+def play(game, frames, seed):
+    # Start game and play it for frames frames pressing random keys, and
+    # return the list of its state hashes after every frame
+    rng = random.Random(seed)
+    hashes = []
+    for frame in range(frames):
+        keys = [pygame.K_m] if frame == 0 else [rng.choice(KEYS)] * rng.randint(0, 1)
+        if not game.step(1, [keys]):
+            break
+        hashes.append(game.state_hash())
+    return hashes
+
+
+@pytest.mark.parametrize('game_class', GAME_CLASSES)
+@pytest.mark.parametrize('seed', [7, -1])
+def test_replay_reproduces_state_hashes(tmp_path, game_class, seed):
+    game = game_class(seed=seed)
+    game.recorder = treason.InputRecorder(game.seed, game.surface_size)
+    hashes = play(game, 600, 1)
+    path = str(tmp_path / 'keys.rec')
+    game.recorder.save(path, game.frame_counter)
+    replayed, replayed_hashes = treason.replay(path, game_class=game_class)
+    assert replayed_hashes == hashes
+    assert replayed.state_hash() == game.state_hash()
+
+
+@pytest.mark.parametrize('game_class', GAME_CLASSES)
+def test_checkpoint_round_trip(game_class):
+    game = game_class(seed=3)
+    play(game, 300, 2)
+    data = game.save_state()
+    loaded = game_class(seed=4)
+    loaded.load_state(data)
+    assert loaded.save_state() == data
+    assert loaded.state_hash() == game.state_hash()
+    # both go on the same way after the checkpoint
+    assert play(loaded, 200, 5) == play(game, 200, 5)
+
+
+@pytest.mark.parametrize('game_class', GAME_CLASSES)
+def test_checkpoint_wrong_size(game_class):
+    game = game_class(seed=3)
+    play(game, 100, 2)
+    data = game.save_state()
+    loaded = game_class(seed=4)
+    before = loaded.save_state()
+    for bad in (data[:-1], data + b'\0'):
+        with pytest.raises(ValueError):
+            loaded.load_state(bad)
+    assert loaded.save_state() == before
+
+
+@pytest.mark.parametrize('game_class', GAME_CLASSES)
+def test_checkpoint_bad_values(game_class):
+    game = game_class(seed=3)
+    play(game, 100, 2)
+    data = game.save_state()
+    loaded = game_class(seed=4)
+    before = loaded.save_state()
+    # the kind of game, and the index of end_game_reason at the end of the numbers
+    end_reason = treason.Checkpoint.header.size + treason.Checkpoint.numbers.size - 1
+    for index in (6, end_reason):
+        bad = bytearray(data)
+        bad[index] = 200
+        with pytest.raises(ValueError):
+            loaded.load_state(bytes(bad))
+    assert loaded.save_state() == before
+
+
+def random_dot(rng, status, low=-50, high=1050):
+    # Return a Dot of status with a random team color, radius, center and velocity
+    color = rng.choice(treason.TEAM_COLORS)
+    return treason.Dot(color, color, rng.randint(1, 60), (rng.randint(low, high), rng.randint(low, high)),
+                       rng.choice(treason.ENEMY_VELOCITY_CHOICES), status)
+
+
+@pytest.mark.parametrize('cell_size', [7, 40, 128])
+def test_grid_finds_every_hit(cell_size):
+    rng = random.Random(cell_size)
+    grid = treason.SpatialGrid(cell_size)
+    for trial in range(20):
+        enemies = [random_dot(rng, treason.ENEMY) for i in range(rng.randint(0, 60))]
+        grid.rebuild(enemies)
+        for bullet in [random_dot(rng, treason.PLAYER_BULLET) for i in range(60)]:
+            found = set(grid.query(bullet))
+            for index in range(len(enemies)):
+                if bullet.check_range(enemies[index], 'x') and bullet.check_range(enemies[index], 'y'):
+                    assert index in found
+
+
+@needs_numpy
+def test_enemies_see_matches_check_surroundings():
+    rng = random.Random(15)
+    seen = 0
+    for trial in range(200):
+        player = random_dot(rng, treason.PLAYER, 400, 600)
+        enemies = [random_dot(rng, treason.ENEMY, 300, 700) for i in range(rng.randint(1, 40))]
+        x, y, velocity_x, velocity_y, radius, team = (
+            treason.numpy.array([treason.PERCEPTION_FIELDS(enemy) for enemy in enemies]).T)
+        sees = treason.enemies_see(x, y, velocity_x, velocity_y, radius, team, player).tolist()
+        assert sees == [enemy.check_surroundings(player) for enemy in enemies]
+        seen += sum(sees)
+    assert seen > 0
@@ -5,14 +5,47 @@
 # game framework heavily based on CMPUT174's game template at the University of Alberta
 
 import pygame
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
 import random
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from itertools import chain, islice
+from operator import attrgetter
+
+# numpy is not imported lazily: whenever it is installed, import pygame has
+# already imported it for pygame.surfarray, so importing it here costs nothing
+try:
+    import numpy
+except ImportError:  # only ArrayGame needs numpy; Game falls back to slower enemy perception
+    numpy = None
 
 
 # User-defined functions
 
-def main():
-    # initialize all pygame modules (some need initialization)
-    pygame.init()
+def main(seed=None, record_path=None, max_frames=None, pipelined=False, load_path=None, save_path=None):
+    # - seed is the int seed of the game's random numbers, or None for a random one
+    # - record_path is a file to save the keys pressed to, or None
+    # - load_path is a checkpoint file to start the game from, or None
+    # - save_path is a file to save a checkpoint of the game to on quitting, or None
+    # - max_frames is how many frames to draw before quitting, or None to play
+    #   until the window is closed
+    # - pipelined is True to update the game on a second thread while frames
+    #   are drawn, see Game.play_pipelined
+    if load_path is not None and record_path is not None:
+        # a replay starts from the recorded seed, not from the checkpoint
+        raise ValueError('a game started from a checkpoint cannot be recorded')
+    # initialize only the pygame modules the game uses, which starts much
+    # faster than pygame.init bringing up the mixer, joysticks and the rest
+    pygame.display.init()
+    pygame.font.init()
     # create a pygame display window
     pygame.display.set_mode((1000, 800))
     # set the title of the display window
@@ -21,76 +54,427 @@ def main():
     # get the display surface
     w_surface = pygame.display.get_surface()
     # create a game object
-    game = Game(w_surface)
+    # that only redraws the parts of the window that change
+    game = Game(w_surface, dirty_rects=True, seed=seed)
+    if load_path is not None:
+        game.load_checkpoint(load_path)
+    if record_path is not None:
+        game.recorder = InputRecorder(game.seed, game.surface_size)
+    # profile from the first frame when asked to with TREASON_PROFILE
+    game.profiler.enabled = os.environ.get('TREASON_PROFILE', '') not in ('', '0')
+    # capture the frames when asked to with TREASON_CAPTURE
+    capture_path = os.environ.get('TREASON_CAPTURE')
+    if capture_path:
+        game.capture = FrameCapture(capture_path, int(os.environ.get('TREASON_CAPTURE_EVERY', '1')),
+                                    os.environ.get('TREASON_CAPTURE_FORMAT', 'png'))
     # start the main game loop by calling the play method on the game object
-    game.play()
+    if pipelined:
+        game.play_pipelined(max_frames)
+    else:
+        game.play(max_frames)
+    if record_path is not None:
+        game.recorder.save(record_path, game.frame_counter)
+    if save_path is not None:
+        game.save_checkpoint(save_path)
+    if game.capture is not None:
+        game.capture.close()
+        print(game.capture.report())
+    # save the profile when asked to with TREASON_PROFILE_OUT
+    profile_path = os.environ.get('TREASON_PROFILE_OUT')
+    if profile_path and len(game.profiler.samples) > 0:
+        if profile_path.endswith('.json'):
+            game.profiler.write_trace(profile_path)
+        else:
+            game.profiler.write_csv(profile_path)
     # quit pygame and clean up the pygame window
     pygame.quit()
 
 
+def replay(path, render=False, game_class=None):
+    # Replay the keys saved by an InputRecorder as fast as possible and return
+    # the Game at the end together with the list of its state hashes after
+    # every frame
+    # - path is the recording file
+    # - render is True to draw every frame in a window
+    # - game_class is the kind of Game to replay with, Game if None
+    if game_class is None:
+        game_class = Game
+    seed, size, end_frame, keys = InputRecorder.load(path)
+    surface = None
+    if render:
+        pygame.display.init()
+        pygame.font.init()
+        surface = pygame.display.set_mode(size)
+        pygame.display.set_caption('treason replay')
+    game = game_class(surface, size, seed=seed)
+    hashes = []
+    index = 0
+    while game.frame_counter < end_frame and game.continue_game:
+        # press the keys that were pressed before this frame
+        while index < len(keys) and keys[index][0] <= game.frame_counter:
+            game.handle_key(keys[index][1])
+            index += 1
+        game.update()
+        game.decide_continue()
+        hashes.append(game.state_hash())
+        if render:
+            pygame.event.pump()
+            game.draw()
+            game.present()
+    if render:
+        pygame.quit()
+    return game, hashes
+
+
 # User-defined classes
 
+class Status(IntEnum):
+    # The kinds of dot in the game
+
+    PLAYER = 0
+    ENEMY = 1
+    PLAYER_BULLET = 2
+    ENEMY_BULLET = 3
+
+
+# the statuses as plain names, which are quicker to look up in the hot loops
+PLAYER, ENEMY, PLAYER_BULLET, ENEMY_BULLET = Status
+
+
+class Team(IntEnum):
+    # The colors a dot can be, in the order of TEAM_COLORS
+
+    RED = 0
+    GREEN = 1
+    ORANGE = 2
+
+
+TEAM_COLORS = [pygame.Color('red'), pygame.Color('green'), pygame.Color('orange')]
+TEAM_BY_COLOR = {int(TEAM_COLORS[team]): team for team in Team}
+ENEMY_VELOCITY_CHOICES = [(-3, 0), (3, 0), (0, -3), (0, 3)]
+
+
+def team_of(color):
+    # returns the Team of a pygame.Color, or -1 if it is not a team color
+    if color is None:
+        return -1
+    return TEAM_BY_COLOR.get(int(color), -1)
+
+
+# the Dot attributes enemies_see needs, in its argument order
+PERCEPTION_FIELDS = attrgetter('x', 'y', 'velocity_x', 'velocity_y', 'radius', 'team')
+# the Dot attributes a FrameSnapshot keeps, in the order of its columns
+SNAPSHOT_FIELDS = attrgetter('x', 'y', 'previous_x', 'previous_y', 'radius', 'team')
+
+
+def enemies_see(x, y, velocity_x, velocity_y, radius, team, other):
+    # returns a numpy bool array of which enemies see the Dot other ahead of
+    # them, with the same 20/60 px windows as Dot.check_surroundings, for all
+    # the enemies at once
+    # - x, y, velocity_x, velocity_y, radius and team are numpy int arrays
+    #   with one entry per live enemy
+    # - other is the Dot to look for
+    other_x = other.x
+    other_y = other.y
+    other_radius = other.radius
+    in_x_range = (other_y + other_radius >= y - radius) & (other_y - other_radius <= y + radius)
+    in_y_range = (other_x + other_radius >= x - radius) & (other_x - other_radius <= x + radius)
+    left = ((x - radius - 20) - (other_x + other_radius) < 0) & (velocity_x < 0) & (
+        x + radius > other_x + other_radius)
+    right = ((other_x - other_radius) - (x + radius + 20) < 0) & (velocity_x > 0) & (
+        x - radius < other_x - other_radius)
+    top = ((y - radius - 60) - (other_y + other_radius) < 0) & (velocity_y > 0) & (
+        y + radius < other_y + other_radius)
+    bottom = ((other_y - other_radius) - (y + radius + 20) < 0) & (velocity_y < 0) & (
+        y - radius > other_y - other_radius)
+    return (team != other.team) & (((left | right) & in_x_range) | ((top | bottom) & in_y_range))
+
+
+if numpy is not None:
+    ENEMY_VELOCITIES = numpy.array(ENEMY_VELOCITY_CHOICES)
+
+
 class Game:
     # An object in this class represents a complete game.
 
-    def __init__(self, surface):
+    def __init__(self, surface=None, size=(1000, 800), dirty_rects=False, seed=None):
         # Initialize a Game.
         # - self is the Game to initialize
-        # - surface is the display window surface object
+        # - surface is the display window surface object, an offscreen
+        #   pygame.Surface, or None to run headless without drawing anything
+        # - size is the (width, height) of the playing field when there is no surface
+        # - dirty_rects is True to only erase, redraw and update the parts of
+        #   the screen that changed since the last frame
+        # - seed is the int seed of the game's random numbers, or None to pick one
 
         # === objects that are part of every game that we will discuss
         self.surface = surface
+        if surface is not None:
+            size = surface.get_size()
+        self.surface_size = (size[0], size[1])
         self.bg_color = pygame.Color('black')
+        self.dirty_rects = dirty_rects
+        self.previous_rects = []  # what was drawn last frame, to be erased
+        self.updated_rects = None  # what present should update, None for everything
+        self.drawn_screen = None  # which screen was drawn last frame
 
-        self.FPS = 60
+        self.FPS = 144  # the most frames drawn per second, 0 for no limit
+        self.TICK_RATE = 60  # how many times per second the game is updated
+        self.max_catch_up_ticks = 5  # the most updates run between two frames
         self.game_Clock = pygame.time.Clock()
         self.close_clicked = False
         self.continue_game = True
+        self.end_game_reason = None  # why the game ended, once it has
         self.play_game = False
         self.level = 1
+        self.set_seed(seed)
+
+        # === balance settings
+        self.max_lives = 9  # lives at the start of each level and the most you can have
+        self.enemies_per_level = 5  # how many more enemies each level has
+        self.enemy_fire_cadence = 10  # enemies that see the player fire every this many frames
+        self.random_fire_odds = 500  # each frame an enemy fires at random with 1 in this + 1 odds
+
+        self.recorder = None  # an InputRecorder saving the keys pressed, or None
+        self.key_queue = None  # keys to send to the simulation thread in pipelined play
+        self.checkpoint_kind = 0  # which kind of game save_state saves, see Checkpoint.kinds
+        self.capture = None  # a FrameCapture saving the frames drawn, or None
+        # times each part of every frame when turned on with F3, or by main
+        # when TREASON_PROFILE=1
+        self.profiler = FrameProfiler()
+        self.collision_tests = 0  # bullet hit tests since the profiler last looked
+        self.enemies_shot = 0  # enemies shot since the game started
+        self.lives_lost = 0  # lives taken by enemy bullets since the game started
 
         # === game specific objects
         # player things
-        self.player_dot = Dot(pygame.Color('red'), pygame.Color('white'), 10, [self.surface.get_width(
-        ) // 2, self.surface.get_height() // 2], [0, 0], self.surface, 'player')
+        self.player_dot = Dot(pygame.Color('red'), pygame.Color('white'), 10, [self.surface_size[0] // 2,
+                              self.surface_size[1] // 2], [0, 0], PLAYER)
 
-        self.player_bullets = []
+        self.player_bullets = BulletManager(PLAYER_BULLET, 150, 50)
 
-        self.game_lives = 9
+        self.game_lives = self.max_lives
 
         # enemy things
         self.number_enemies = 10
+        self.create_enemies()
+
+        self.enemy_bullets = BulletManager(ENEMY_BULLET, 1000, 100)
+
+        # other game things
+        self.frame_counter = 0
+        self.enemy_grid = SpatialGrid(40)
+        # fonts, text and sprites are made the first time they are drawn
+        self.text_cache = TextCache()
+        self.sprites = SpriteAtlas()
+
+    def set_seed(self, seed):
+        # Start the game's random numbers over from seed
+        # - self is the Game
+        # - seed is an int, or None to pick one at random. It is kept as an
+        #   unsigned 64 bit int, the form recordings, checkpoints and numpy
+        #   take, so a negative seed like -1 works everywhere.
+        if seed is None:
+            seed = random.getrandbits(32)
+        seed &= 2 ** 64 - 1
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def create_enemies(self):
+        # Replace self.enemy_dots with number_enemies + 1 new enemies placed randomly.
+        # enemy_dots only ever holds enemies that have not been shot, and
+        # enemies_left counts them by Team.
+        # - self is the Game to fill with enemies
         enemy_colors = ['red', 'green', 'orange']
+        width, height = self.surface_size
         self.enemy_dots = []
+        self.enemies_left = [0] * len(Team)
         for i in range(self.number_enemies + 1):
-            color = random.choice(enemy_colors)
+            color = self.random.choice(enemy_colors)
             radius = 9
-            x = random.randint(radius, self.surface.get_width() - radius)
-            y = random.randint(radius, self.surface.get_height() - radius)
-            velocity_choices = [[-3, 0], [3, 0], [0, -3], [0, 3]]
+            x = self.random.randint(radius, width - radius)
+            y = self.random.randint(radius, height - radius)
             enemy = Dot(pygame.Color(color), pygame.Color(color), radius, [
-                        x, y], random.choice(velocity_choices), self.surface, 'enemy')
+                        x, y], self.random.choice(ENEMY_VELOCITY_CHOICES), ENEMY)
             self.enemy_dots.append(enemy)
+            self.enemies_left[enemy.team] += 1
 
-        self.enemy_bullets = []
-
-        # other game things
-        self.frame_counter = 0
-
-    def play(self):
+    def play(self, max_frames=None):
         # Play the game until the player presses the close box.
+        # The game is updated TICK_RATE times per second no matter how fast
+        # frames are drawn, and frames show the dots part way between updates.
         # - self is the Game that should be continued or not.
+        # - max_frames is how many frames to draw before stopping, or None for no limit
 
+        tick_seconds = 1 / self.TICK_RATE
+        time_behind = 0.0  # how much game time has not been updated yet
+        previous_time = time.perf_counter()
+        profiler = self.profiler
+        frames_drawn = 0
         while not self.close_clicked:  # until player clicks close box
             # play frame
+            profiling = profiler.enabled
+            if profiling:
+                profiler.start_frame()
             self.handle_events()
-            self.draw()
+            if profiling:
+                profiler.mark('handle_events')
+            now = time.perf_counter()
+            time_behind += now - previous_time
+            previous_time = now
+            ticks = 0
+            while time_behind >= tick_seconds and ticks < self.max_catch_up_ticks:
+                if self.continue_game:
+                    self.update()
+                    self.decide_continue()
+                time_behind -= tick_seconds
+                ticks += 1
+            if ticks == self.max_catch_up_ticks:
+                # too far behind to catch up, so let the game slow down instead
+                time_behind = 0.0
+            if profiling:
+                profiler.mark('update')
             if self.continue_game:
-                self.update()
-                self.decide_continue()
+                self.draw(time_behind / tick_seconds)
+            else:
+                self.draw()
+            if profiling:
+                profiler.mark('draw')
+            self.present()  # make the updated surface appear on the display
+            if profiling:
+                profiler.mark('display_update')
+                profiler.end_frame(self)
+            if self.capture is not None:
+                self.capture.grab(self.surface, frames_drawn)
+            frames_drawn += 1
+            if max_frames is not None and frames_drawn >= max_frames:
+                break
             # run at most with FPS Frames Per Second
             self.game_Clock.tick(self.FPS)
 
+    def step(self, n_frames=1, inputs=None, render=False):
+        # Advance the game by n_frames frames as fast as possible, without
+        # reading pygame events or waiting on the clock, and return whether the
+        # game is still going
+        # - self is the Game to advance
+        # - inputs is an optional sequence with one entry per frame, each entry
+        #   being a sequence of pygame key constants pressed before that frame
+        # - render is True to also draw every frame onto self.surface
+        for i in range(n_frames):
+            if inputs is not None and i < len(inputs):
+                for key in inputs[i]:
+                    self.handle_key(key)
+            if self.continue_game:
+                self.update()
+                self.decide_continue()
+            if render:
+                self.draw()
+        return self.continue_game
+
+    def play_pipelined(self, max_frames=None):
+        # Play the game like play, but update it on a second thread while the
+        # main thread draws. Each frame the main thread takes the FrameSnapshot
+        # the simulation thread filled, hands it the other one to fill with the
+        # next updates, and draws the first while those updates run. Frames
+        # show the game one frame later than play does.
+        # - self is the Game to play
+        # - max_frames is as for play
+        if numpy is None:
+            raise ImportError('pipelined play needs numpy to be installed')
+        tick_seconds = 1 / self.TICK_RATE
+        time_behind = 0.0  # how much game time has not been handed to the simulation yet
+        previous_time = time.perf_counter()
+        profiler = self.profiler
+        frames_drawn = 0
+        self.key_queue = []
+        requests = queue.SimpleQueue()
+        results = queue.SimpleQueue()
+        worker = threading.Thread(target=self.simulate, args=(requests, results),
+                                  name='treason simulation', daemon=True)
+        worker.start()
+        # the first frame shows the game as it starts
+        back = FrameSnapshot()
+        requests.put((0, [], FrameSnapshot()))
+        waiting = True
+        try:
+            while not self.close_clicked:  # until player clicks close box
+                profiling = profiler.enabled
+                if profiling:
+                    profiler.start_frame()
+                self.handle_events()
+                if profiling:
+                    profiler.mark('handle_events')
+                now = time.perf_counter()
+                time_behind += now - previous_time
+                previous_time = now
+                ticks = min(int(time_behind / tick_seconds), self.max_catch_up_ticks)
+                time_behind -= ticks * tick_seconds
+                if ticks == self.max_catch_up_ticks:
+                    # too far behind to catch up, so let the game slow down instead
+                    time_behind = 0.0
+
+                # swap snapshots with the simulation thread and start the next updates
+                front = results.get()
+                waiting = False
+                if isinstance(front, BaseException):
+                    raise front
+                back.alpha = time_behind / tick_seconds
+                # the keys of this frame go with its ticks, as in play
+                keys = self.key_queue
+                self.key_queue = []
+                requests.put((ticks, keys, back))
+                waiting = True
+                if profiling:
+                    # the time spent waiting for the simulation thread
+                    profiler.mark('update')
+
+                self.draw(front.alpha if front.continue_game else 1.0, front)
+                if profiling:
+                    profiler.mark('draw')
+                self.present()
+                if profiling:
+                    profiler.mark('display_update')
+                    profiler.end_frame(front)
+                if self.capture is not None:
+                    self.capture.grab(self.surface, frames_drawn)
+                back = front
+                frames_drawn += 1
+                if max_frames is not None and frames_drawn >= max_frames:
+                    break
+                # run at most with FPS Frames Per Second
+                self.game_Clock.tick(self.FPS)
+        finally:
+            if waiting:
+                results.get()
+            requests.put(None)
+            worker.join()
+            self.key_queue = None
+
+    def simulate(self, requests, results):
+        # Run on the simulation thread of play_pipelined: for each
+        # (ticks, keys, snapshot) request, apply keys, update the game
+        # ticks times and fill snapshot, then hand the snapshot back. Stops at
+        # a None request, or after handing back an exception that was raised.
+        # - self is the Game to update
+        # - requests and results are the queue.SimpleQueues to and from the main thread
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            ticks, keys, snapshot = request
+            try:
+                for key in keys:
+                    self.handle_key(key)
+                for i in range(ticks):
+                    if self.continue_game:
+                        self.update()
+                        self.decide_continue()
+                self.take_snapshot(snapshot)
+            except BaseException as error:
+                results.put(error)
+                return
+            results.put(snapshot)
+
     def handle_events(self):
         # Handle each user event by changing the game state appropriately.
         # - self is the Game whose events will be handled
@@ -101,148 +485,471 @@ class Game:
                 self.close_clicked = True
             if event.type == pygame.KEYDOWN:
                 self.handle_keydown(event)
+            if event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.VIDEOEXPOSE):
+                # the window lost what was on it, so redraw all of it
+                self.drawn_screen = None
 
     def handle_keydown(self, event):
         # handles a user event of pressing a key down
         # event is the event list
+        if event.key == pygame.K_F3:
+            # F3 turns the profiler on and off, and is not part of the game
+            self.profiler.toggle()
+            self.drawn_screen = None
+        elif self.key_queue is not None:
+            # in pipelined play only the simulation thread changes the game, so
+            # the key waits to be sent with the frame's ticks
+            self.key_queue.append(event.key)
+        else:
+            self.handle_key(event.key)
+
+    def handle_key(self, key):
+        # handles a key being pressed, whether it came from pygame or from step
+        # key is the pygame key constant
         # different arrow keys will eventually move the player ball differently
+        if self.recorder is not None:
+            self.recorder.record(self.frame_counter, key)
         color = self.player_dot.get_color()
         center = self.player_dot.get_center()
         velocity = self.player_dot.get_velocity()
-        if event.key == pygame.K_m:
+        if key == pygame.K_m:
             self.play_game = True
         if self.play_game:
             # keys that move player ball
-            if event.key == pygame.K_UP:
+            if key == pygame.K_UP:
                 self.player_dot.set_velocity((0, -4))
-            if event.key == pygame.K_DOWN:
+            if key == pygame.K_DOWN:
                 self.player_dot.set_velocity((0, 4))
-            if event.key == pygame.K_LEFT:
+            if key == pygame.K_LEFT:
                 self.player_dot.set_velocity((-4, 0))
-            if event.key == pygame.K_RIGHT:
+            if key == pygame.K_RIGHT:
                 self.player_dot.set_velocity((4, 0))
             # key that shoots
-            if event.key == pygame.K_SPACE:
+            if key == pygame.K_SPACE:
                 if velocity != [0, 0]:
-                    bullet = Dot(color, color, 5, center, velocity,
-                                 self.surface, 'player_bullet')
-                    self.player_bullets.append(bullet)
+                    self.shoot(color, center, velocity, PLAYER_BULLET)
             # keys that change player ball color
-            if event.key == pygame.K_x:
+            if key == pygame.K_x:
                 self.player_dot.set_color(pygame.Color('red'))
-            if event.key == pygame.K_c:
+            if key == pygame.K_c:
                 self.player_dot.set_color(pygame.Color('orange'))
-            if event.key == pygame.K_v:
+            if key == pygame.K_v:
                 self.player_dot.set_color(pygame.Color('green'))
 
-    def draw(self):
-        # Draw all game objects.
-        # - self is the Game to draw
+    def shoot(self, color, center, velocity, status):
+        # Fire a new bullet
+        # - self is the Game the bullet belongs to
+        # - color is the pygame.Color of the bullet
+        # - center and velocity are [x, y] lists for the new bullet
+        # - status is PLAYER_BULLET or ENEMY_BULLET
+        if status == PLAYER_BULLET:
+            self.player_bullets.fire(color, center, velocity)
+        else:
+            self.enemy_bullets.fire(color, center, velocity)
 
-        self.surface.fill(self.bg_color)  # clear the display surface first
+    def draw(self, alpha=1.0, snapshot=None):
+        # Draw all game objects onto the surface. Nothing is drawn when the game is headless.
+        # - self is the Game to draw
+        # - alpha is how far between the last two updates to show the dots,
+        #   from 0.0 for where they were to 1.0 for where they are now
+        # - snapshot is a FrameSnapshot to draw instead of the game itself, or None
+        if self.surface is None:
+            return
+        view = self if snapshot is None else snapshot
 
-        # draw player things
-        if self.play_game:
-            self.player_dot.draw()
-            for bullet in self.player_bullets:
-                bullet.draw()
-                for enemy in self.enemy_dots:
-                    self.game_lives = bullet.check_bullet_shot(
-                        enemy, self.game_lives)
+        # redraw everything when the screen changes, otherwise only erase
+        # what was drawn last frame when in dirty rects mode
+        screen = (view.play_game, view.continue_game, view.level)
+        full_redraw = not self.dirty_rects or screen != self.drawn_screen
+        if full_redraw:
+            self.surface.fill(self.bg_color)  # clear the display surface first
+        else:
+            for rect in self.previous_rects:
+                self.surface.fill(self.bg_color, rect)
 
-        # draw enemy things
-        if self.play_game:
-            for enemy in self.enemy_dots:
-                enemy.draw()
-            for bullet in self.enemy_bullets:
-                bullet.draw()
-                self.game_lives = bullet.check_bullet_shot(
-                    self.player_dot, self.game_lives)
+        rects = []
+        if view.play_game:
+            if snapshot is None:
+                rects = self.draw_dots(alpha)
+            else:
+                rects = self.draw_snapshot_dots(snapshot, alpha)
 
         # draw game text
-        if self.play_game == False:
+        if view.play_game == False:
             self.display_instructions()
         else:
-            self.display_level()
-        if self.continue_game == False:
-            self.display_game_over()
+            hud_rect = self.display_level(view)
+            rects.append(hud_rect)
+            if self.profiler.enabled:
+                rects.extend(self.display_profile(hud_rect))
+        if view.continue_game == False:
+            self.display_game_over(view)
+
+        if full_redraw:
+            self.updated_rects = None
+        else:
+            self.updated_rects = self.previous_rects + rects
+        self.previous_rects = rects
+        self.drawn_screen = screen
+
+    def draw_dots(self, alpha=1.0):
+        # Draw the player, the enemies and all bullets with one batch of
+        # sprite blits and return the list of rects that were drawn on
+        # - self is the Game to draw
+        # - alpha is as for draw
+        sprites = self.sprites
+        blit_list = []
+        # draw player things, then enemy things
+        for dots in ([self.player_dot], self.player_bullets, self.enemy_dots, self.enemy_bullets):
+            for dot in dots:
+                if not dot.shot_yes:
+                    radius = dot.radius
+                    x = dot.x
+                    y = dot.y
+                    if alpha != 1.0:
+                        x = round(dot.previous_x + (x - dot.previous_x) * alpha)
+                        y = round(dot.previous_y + (y - dot.previous_y) * alpha)
+                    blit_list.append((sprites.get(dot.color, dot.outside_color, radius),
+                                      (x - radius, y - radius)))
+        return self.surface.blits(blit_list)
+
+    def draw_snapshot_dots(self, snapshot, alpha=1.0):
+        # Draw the dots of a FrameSnapshot like draw_dots and return the list
+        # of rects that were drawn on
+        # - self is the Game to draw
+        # - snapshot is the FrameSnapshot to draw
+        # - alpha is as for draw
+        sprites = self.sprites
+        rows = snapshot.dots[:snapshot.count]
+        centers = rows[:, 0:2]
+        if alpha != 1.0:
+            previous = rows[:, 2:4]
+            centers = numpy.rint(previous + (centers - previous) * alpha).astype(numpy.int64)
+        corners = (centers - rows[:, 4:5]).tolist()
+        radii = rows[:, 4].tolist()
+        teams = rows[:, 5].tolist()
+        # the player comes first and is the only dot with its own outline
+        blit_list = [(sprites.get(snapshot.player_color, snapshot.player_outside_color, radii[0]), corners[0])]
+        for i in range(1, len(corners)):
+            color = TEAM_COLORS[teams[i]]
+            blit_list.append((sprites.get(color, color, radii[i]), corners[i]))
+        return self.surface.blits(blit_list)
+
+    def take_snapshot(self, snapshot):
+        # Fill a FrameSnapshot with everything draw needs to show the game as
+        # it is now, the dots in the order draw_dots draws them
+        # - self is the Game to copy
+        # - snapshot is the FrameSnapshot to fill
+        self.fill_snapshot_state(snapshot)
+        groups = ([self.player_dot], self.player_bullets, self.enemy_dots, self.enemy_bullets)
+        count = 0
+        for dots in groups:
+            count += len(dots)
+        snapshot.reserve(count)
+        snapshot.dots[:count] = numpy.fromiter(
+            chain.from_iterable(map(SNAPSHOT_FIELDS, chain.from_iterable(groups))),
+            numpy.int64, 6 * count).reshape(count, 6)
+        snapshot.count = count
 
-        # reset self.player_bullets and self.enemy_bullets after so many bullets have been shot
-        if len(self.player_bullets) > 150:
-            for i in range(50):
-                self.player_bullets.pop(0)
-        if len(self.enemy_bullets) > 1000:
-            for i in range(100):
-                self.enemy_bullets.pop(0)
+    def fill_snapshot_state(self, snapshot):
+        # Copy what draw shows besides the dots into a FrameSnapshot, and hand
+        # the counts for the profiler over with it
+        # - self is the Game to copy
+        # - snapshot is the FrameSnapshot to fill
+        snapshot.play_game = self.play_game
+        snapshot.continue_game = self.continue_game
+        snapshot.level = self.level
+        snapshot.game_lives = self.game_lives
+        snapshot.max_lives = self.max_lives
+        snapshot.end_game_reason = self.end_game_reason
+        snapshot.player_color = self.player_dot.color
+        snapshot.player_outside_color = self.player_dot.outside_color
+        snapshot.entities, snapshot.bullets = self.count_entities()
+        snapshot.collision_tests = self.collision_tests
+        self.collision_tests = 0
 
-        pygame.display.update()  # make the updated surface appear on the display
+    def present(self):
+        # Show what draw drew on the display, only updating the changed parts
+        # in dirty rects mode
+        # - self is the Game to show
+        if self.updated_rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.updated_rects)
 
     def update(self):
         # Update the game objects for the next frame.
         # - self is the Game to update
+        if self.play_game:
+            if self.profiler.enabled:
+                start = time.perf_counter()
+                self.check_collisions()
+                self.profiler.add_span('collisions', start, time.perf_counter())
+            else:
+                self.check_collisions()
+        self.update_entities()
+
+    def check_collisions(self):
+        # Check every bullet against what it can hit and apply the hits.
+        # Player bullets are only tested against enemies in nearby grid cells,
+        # and the enemies they shoot are taken out of enemy_dots afterwards.
+        # - self is the Game to check
+        if len(self.player_bullets) > 0:
+            enemies = self.enemy_dots
+            self.enemy_grid.rebuild(enemies)
+            killed = set()
+            for bullet in self.player_bullets:
+                candidates = self.enemy_grid.query(bullet)
+                self.collision_tests += len(candidates)
+                for index in candidates:
+                    enemy = enemies[index]
+                    self.game_lives = bullet.check_bullet_shot(
+                        enemy, self.game_lives, self.max_lives)
+                    if enemy.shot_yes:
+                        killed.add(index)
+            if killed:
+                self.remove_enemies(killed)
+        self.collision_tests += len(self.enemy_bullets)
+        lives = self.game_lives
+        for bullet in self.enemy_bullets:
+            lives = bullet.check_bullet_shot(self.player_dot, lives)
+        self.lives_lost += self.game_lives - lives
+        self.game_lives = lives
+
+    def remove_enemies(self, indices):
+        # Take shot enemies out of enemy_dots by moving the last enemy into
+        # each one's place, and count them off enemies_left
+        # - self is the Game to remove from
+        # - indices is a collection of int indices into enemy_dots
+        enemies = self.enemy_dots
+        self.enemies_shot += len(indices)
+        for index in sorted(indices, reverse=True):
+            self.enemies_left[enemies[index].team] -= 1
+            last = enemies.pop()
+            if index < len(enemies):
+                enemies[index] = last
+
+    def count_entities(self):
+        # Return how many dots are still in play and how many bullets are live
+        # - self is the Game to count
+        return 1 + len(self.enemy_dots), len(self.player_bullets) + len(self.enemy_bullets)
+
+    def update_entities(self):
+        # Move every game object, let enemies fire and change level when needed.
+        # - self is the Game to update
 
         # update player things
         if self.play_game:
-            self.player_dot.move(self.frame_counter)
-            self.player_dot.boundary_stop()
+            self.player_dot.move(self.frame_counter, self.random)
+            self.player_dot.boundary_stop(self.surface_size)
             for bullet in self.player_bullets:
-                bullet.move(self.frame_counter)
+                bullet.move(self.frame_counter, self.random)
 
             # update enemy things
-            for enemy in self.enemy_dots:
-                enemy.move(self.frame_counter)
-                enemy.boundary_stop()
-                # check if player dot in enemy range
-                should_enemy_shoot = enemy.check_surroundings(self.player_dot)
-                # if yes, shoot at player
-                if should_enemy_shoot and self.frame_counter % 10 == 0:
-                    color = enemy.get_color()
-                    center = enemy.get_center()
-                    velocity = enemy.get_velocity()
-                    bullet = Dot(color, color, 5, center, velocity,
-                                 self.surface, 'enemy_bullet')
-                    self.enemy_bullets.append(bullet)
+            enemies = self.enemy_dots
+            random_fire = []
+            for index in range(len(enemies)):
+                enemy = enemies[index]
+                enemy.move(self.frame_counter, self.random)
+                enemy.boundary_stop(self.surface_size)
                 # also just shoot randomly every so often
-                if random.randint(0, 500) == 1 and not enemy.get_shot_status():
-                    color = enemy.get_color()
-                    center = enemy.get_center()
-                    velocity = enemy.get_velocity()
-                    bullet = Dot(color, color, 5, center, velocity,
-                                 self.surface, 'enemy_bullet')
-                    self.enemy_bullets.append(bullet)
+                if self.random.randint(0, self.random_fire_odds) == 1:
+                    random_fire.append(index)
+            # enemies that see the player shoot at it
+            seen = []
+            if self.frame_counter % self.enemy_fire_cadence == 0:
+                seen = self.enemies_seeing_player()
+            # fire in enemy order, seen shots before random ones, as one loop would
+            if seen or random_fire:
+                seen_set = set(seen)
+                random_set = set(random_fire)
+                for index in sorted(seen_set | random_set):
+                    enemy = enemies[index]
+                    if index in seen_set:
+                        self.shoot(enemy.get_color(), enemy.get_center(),
+                                   enemy.get_velocity(), ENEMY_BULLET)
+                    if index in random_set:
+                        self.shoot(enemy.get_color(), enemy.get_center(),
+                                   enemy.get_velocity(), ENEMY_BULLET)
 
             for bullet in self.enemy_bullets:
-                bullet.move(self.frame_counter)
+                bullet.move(self.frame_counter, self.random)
 
-            # check if level should be increased
-            change_level = True
-            for enemy in self.enemy_dots:
-                if not enemy.get_shot_status():
-                    change_level = False
+            # stop tracking bullets that left the screen or hit something
+            self.player_bullets.retire(self.surface_size)
+            self.enemy_bullets.retire(self.surface_size)
 
-            if change_level:
+            # check if level should be increased
+            if not any(self.enemies_left):
                 self.level += 1
-                self.game_lives = 9
-
-                self.number_enemies += 5
-                enemy_colors = ['red', 'green', 'orange']
-                self.enemy_dots = []
-                for i in range(self.number_enemies + 1):
-                    color = random.choice(enemy_colors)
-                    radius = 9
-                    x = random.randint(
-                        radius, self.surface.get_width() - radius)
-                    y = random.randint(
-                        radius, self.surface.get_height() - radius)
-                    velocity_choices = [[-3, 0], [3, 0], [0, -3], [0, 3]]
-                    enemy = Dot(pygame.Color(color), pygame.Color(color), radius, [
-                                x, y], random.choice(velocity_choices), self.surface, 'enemy')
-                    self.enemy_dots.append(enemy)
-
-                self.enemy_bullets = []
+                self.game_lives = self.max_lives
+
+                self.number_enemies += self.enemies_per_level
+                self.create_enemies()
+
+                self.enemy_bullets.clear()
 
         self.frame_counter = self.frame_counter + 1
 
+    def enemies_seeing_player(self):
+        # Return the sorted list of indices of the enemies in enemy_dots that
+        # see the player ahead of them. With numpy all enemies are checked in
+        # one batch by enemies_see, otherwise one at a time.
+        # - self is the Game to look in
+        enemies = self.enemy_dots
+        player = self.player_dot
+        if numpy is None or len(enemies) == 0:
+            return [index for index in range(len(enemies)) if enemies[index].check_surroundings(player)]
+        fields = numpy.fromiter(chain.from_iterable(map(PERCEPTION_FIELDS, enemies)),
+                                numpy.int64, 6 * len(enemies))
+        x, y, velocity_x, velocity_y, radius, team = fields.reshape(len(enemies), 6).T
+        return numpy.flatnonzero(enemies_see(x, y, velocity_x, velocity_y, radius, team, player)).tolist()
+
+    def state_hash(self):
+        # Return a short hex digest of everything that changes as the game is
+        # played, to check that two runs of the game went the same way
+        # - self is the Game to hash
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(struct.pack('<4i??', self.level, int(self.game_lives), self.frame_counter,
+                                  self.number_enemies, self.play_game, self.continue_game))
+        for dots in ([self.player_dot], self.player_bullets, self.enemy_dots, self.enemy_bullets):
+            for dot in dots:
+                digest.update(struct.pack('<4iI?', dot.x, dot.y, dot.velocity_x,
+                                          dot.velocity_y, int(dot.color), dot.shot_yes))
+        return digest.hexdigest()
+
+    def save_state(self):
+        # Return the whole state of the game as checkpoint bytes, which
+        # load_state can restore, see Checkpoint for the format
+        # - self is the Game to save
+        version, mt_state, gauss_next = self.random.getstate()
+        parts = [
+            Checkpoint.header.pack(Checkpoint.magic, Checkpoint.version, self.checkpoint_kind,
+                                   self.surface_size[0], self.surface_size[1]),
+            Checkpoint.numbers.pack(self.seed, self.level, int(self.game_lives), self.frame_counter,
+                                    self.number_enemies, self.max_lives, self.enemies_per_level,
+                                    self.enemy_fire_cadence, self.random_fire_odds, self.play_game,
+                                    self.continue_game, Checkpoint.end_reasons.index(self.end_game_reason)),
+            Checkpoint.random_state.pack(*mt_state, gauss_next is not None, gauss_next or 0.0),
+            Checkpoint.dot.pack(*Checkpoint.dot_fields(self.player_dot)),
+        ]
+        self.save_entities(parts)
+        return b''.join(parts)
+
+    def save_entities(self, parts):
+        # Add the enemies and bullets to the list of checkpoint parts: their
+        # counts, then one record per player bullet, enemy and enemy bullet
+        # - self is the Game to save
+        # - parts is the list of bytes of the checkpoint so far
+        groups = (self.player_bullets, self.enemy_dots, self.enemy_bullets)
+        parts.append(Checkpoint.counts.pack(*[len(dots) for dots in groups]))
+        pack = Checkpoint.dot.pack
+        dot_fields = Checkpoint.dot_fields
+        for dots in groups:
+            parts.extend([pack(*dot_fields(dot)) for dot in dots])
+
+    def load_state(self, data):
+        # Restore the game to the state saved in checkpoint bytes by save_state
+        # - self is the Game to restore
+        # - data is the checkpoint bytes
+        if len(data) < Checkpoint.header.size:
+            raise ValueError('not a treason checkpoint of version {}'.format(Checkpoint.version))
+        magic, version, kind, width, height = Checkpoint.header.unpack_from(data)
+        if magic != Checkpoint.magic or version != Checkpoint.version:
+            raise ValueError('not a treason checkpoint of version {}'.format(Checkpoint.version))
+        if kind >= len(Checkpoint.kinds):
+            raise ValueError('unknown kind of treason checkpoint {}'.format(kind))
+        if kind != self.checkpoint_kind:
+            raise ValueError('a checkpoint of a {} cannot be loaded into {}'.format(
+                Checkpoint.kinds[kind], type(self).__name__))
+        if (width, height) != self.surface_size:
+            raise ValueError('the checkpoint is of a {}x{} game'.format(width, height))
+        # check the size and values before changing anything, so a cut short
+        # or damaged file leaves the game as it was
+        offset = Checkpoint.header.size
+        entities = offset + Checkpoint.numbers.size + Checkpoint.random_state.size + Checkpoint.dot.size
+        if len(data) < entities + Checkpoint.counts.size or (
+                len(data) != entities + self.entities_size(data, entities)):
+            raise ValueError('not a complete treason checkpoint of version {}'.format(Checkpoint.version))
+        numbers = Checkpoint.numbers.unpack_from(data, offset)
+        player = Checkpoint.dot.unpack_from(data, entities - Checkpoint.dot.size)
+        if numbers[-1] >= len(Checkpoint.end_reasons) or player[9] != PLAYER or (
+                not self.entities_valid(data, entities)):
+            raise ValueError('a damaged treason checkpoint')
+        (self.seed, self.level, self.game_lives, self.frame_counter, self.number_enemies,
+         self.max_lives, self.enemies_per_level, self.enemy_fire_cadence, self.random_fire_odds,
+         self.play_game, self.continue_game, end_reason) = numbers
+        self.end_game_reason = Checkpoint.end_reasons[end_reason]
+        offset += Checkpoint.numbers.size
+        random_state = Checkpoint.random_state.unpack_from(data, offset)
+        self.random.setstate((3, random_state[:625], random_state[626] if random_state[625] else None))
+        offset += Checkpoint.random_state.size
+        Checkpoint.restore_dot(self.player_dot, player)
+        offset += Checkpoint.dot.size
+        self.load_entities(data, offset)
+        # nothing drawn before matches the restored game
+        self.drawn_screen = None
+        self.previous_rects = []
+        self.updated_rects = None
+        self.collision_tests = 0
+
+    def entities_size(self, data, offset):
+        # Return how many bytes the enemies and bullets saved by save_entities take
+        # - self is the Game to restore
+        # - data is the checkpoint bytes
+        # - offset is where the enemies and bullets start in data
+        return Checkpoint.counts.size + sum(Checkpoint.counts.unpack_from(data, offset)) * Checkpoint.dot.size
+
+    def entities_valid(self, data, offset):
+        # Return whether every enemy and bullet saved by save_entities has the
+        # status of the list it was saved from
+        # - self is the Game to restore
+        # - data is the checkpoint bytes, already checked by entities_size
+        # - offset is where the enemies and bullets start in data
+        counts = Checkpoint.counts.unpack_from(data, offset)
+        offset += Checkpoint.counts.size
+        for status, count in zip((PLAYER_BULLET, ENEMY, ENEMY_BULLET), counts):
+            for record in Checkpoint.dot.iter_unpack(data[offset:offset + count * Checkpoint.dot.size]):
+                if record[9] != status:
+                    return False
+            offset += count * Checkpoint.dot.size
+        return True
+
+    def load_entities(self, data, offset):
+        # Restore the enemies and bullets saved by save_entities
+        # - self is the Game to restore
+        # - data is the checkpoint bytes
+        # - offset is where the enemies and bullets start in data
+        counts = Checkpoint.counts.unpack_from(data, offset)
+        offset += Checkpoint.counts.size
+        records = list(Checkpoint.dot.iter_unpack(data[offset:offset + sum(counts) * Checkpoint.dot.size]))
+        bullet_records = (records[:counts[0]], records[counts[0] + counts[1]:])
+        for bullets, saved in zip((self.player_bullets, self.enemy_bullets), bullet_records):
+            bullets.clear()
+            for record in saved:
+                bullets.fire(None, (0, 0), (0, 0))
+                Checkpoint.restore_dot(bullets.live[-1], record)
+        self.enemy_dots = []
+        self.enemies_left = [0] * len(Team)
+        for record in records[counts[0]:counts[0] + counts[1]]:
+            enemy = Dot(None, None, 9, (0, 0), (0, 0), ENEMY)
+            Checkpoint.restore_dot(enemy, record)
+            self.enemy_dots.append(enemy)
+            if not enemy.shot_yes:
+                self.enemies_left[enemy.team] += 1
+
+    def save_checkpoint(self, path):
+        # Write the whole state of the game to the file path
+        # - self is the Game to save
+        with open(path, 'wb') as file:
+            file.write(self.save_state())
+
+    def load_checkpoint(self, path):
+        # Restore the game from a file written by save_checkpoint
+        # - self is the Game to restore
+        with open(path, 'rb') as file:
+            self.load_state(file.read())
+
     def decide_continue(self):
         # Check and remember if the game should continue
         # - self is the Game to check
@@ -252,22 +959,25 @@ class Game:
         else:
             self.end_game_reason = 'lives gone'
 
-    def display_game_over(self):
+    def display_game_over(self, view=None):
         # displays game over message at end of game
+        # view is the Game or FrameSnapshot to show, self if None
+        if view is None:
+            view = self
         words1 = 'GAME OVER'
-        if self.end_game_reason == 'all dead':
+        if view.end_game_reason == 'all dead':
             words2 = 'successfully back-stabbed'
-        elif self.end_game_reason == 'lives gone':
-            words2 = 'all 9 lives gone'
+        elif view.end_game_reason == 'lives gone':
+            words2 = 'all {} lives gone'.format(view.max_lives)
         # set font characteristics
         font_size1 = 70
         font_size2 = 40
-        font1 = pygame.font.SysFont("", font_size1)
-        font2 = pygame.font.SysFont("", font_size2)
         fg_color = pygame.Color("white")
         # create text box of string using font characteristics
-        text_box1 = font1.render(words1, True, fg_color, self.bg_color)
-        text_box2 = font2.render(words2, True, fg_color, self.bg_color)
+        text_box1 = self.text_cache.render(
+            words1, font_size1, fg_color, self.bg_color)
+        text_box2 = self.text_cache.render(
+            words2, font_size2, fg_color, self.bg_color)
         # location is middle of window
         location1 = ((self.surface.get_width() - text_box1.get_width()) // 2,
                      (self.surface.get_height() - text_box1.get_height()) // 2)
@@ -285,17 +995,16 @@ class Game:
         line4 = "  change teams by clicking 'x', 'c', and 'v' "
         line5 = '          use the arrow keys to move         '
         line6 = '          use the spacebar to shoot          '
-        line7 = '              you have 9 lives               '
+        line7 = '              you have {} lives               '.format(self.max_lives)
         line8 = "             press 'm' to begin              "
         smaller_lines = [line2, line3, line4, line5, line6, line7, line8]
         # set font characteristics
         font_size1 = 70
         font_size2 = 40
-        font1 = pygame.font.SysFont("", font_size1)
-        font2 = pygame.font.SysFont("", font_size2)
         fg_color = pygame.Color("white")
         # create text box of string using font characteristics
-        text_box1 = font1.render(line1, True, fg_color, self.bg_color)
+        text_box1 = self.text_cache.render(
+            line1, font_size1, fg_color, self.bg_color)
         # location is middle of window
         location1 = ((self.surface.get_width() - text_box1.get_width()) // 2,
                      (self.surface.get_height() - text_box1.get_height()) // 4)
@@ -304,90 +1013,105 @@ class Game:
         # same for smaller lines
         text_adjust = 1
         for line in smaller_lines:
-            text_box2 = font2.render(line, True, fg_color, self.bg_color)
+            text_box2 = self.text_cache.render(
+                line, font_size2, fg_color, self.bg_color)
             location2 = ((self.surface.get_width() - text_box2.get_width()) // 2,
                          (self.surface.get_height() - text_box2.get_height()) // 4 + (text_adjust * 50))
             self.surface.blit(text_box2, location2)
             text_adjust += 1
 
-    def display_level(self):
+    def display_level(self, view=None):
         # displays the level that you are on
+        # view is the Game or FrameSnapshot to show, self if None
+        if view is None:
+            view = self
         words = 'LEVEL {}      lives: {}'.format(
-            self.level, int(self.game_lives))
+            view.level, int(view.game_lives))
         # set font characteristics
         font_size = 40
-        font = pygame.font.SysFont("", font_size)
         fg_color = pygame.Color("white")
-        # create text box of string using font characteristics
-        text_box = font.render(words, True, fg_color, self.bg_color)
+        # create text box of string using font characteristics, which is only
+        # rendered again when the level or lives change
+        text_box = self.text_cache.render(
+            words, font_size, fg_color, self.bg_color)
         # location is top left corner
         location = (10, 10)
-        # blit to game surface at location
-        self.surface.blit(text_box, location)
+        # blit to game surface at location and return where it went
+        return self.surface.blit(text_box, location)
+
+    def display_profile(self, hud_rect):
+        # displays the profiler's rolling averages to the right of the level
+        # and returns the rects they went in
+        # hud_rect is where display_level drew
+        font_size = 22
+        fg_color = pygame.Color("yellow")
+        rects = []
+        location = (hud_rect.right + 30, 8)
+        for line in self.profiler.overlay_lines():
+            text_box = self.text_cache.render(
+                line, font_size, fg_color, self.bg_color)
+            rects.append(self.surface.blit(text_box, location))
+            location = (location[0], location[1] + text_box.get_height())
+        return rects
 
 
 class Dot:
-    # An object in this class represents a Dot that moves
+    # An object in this class represents a Dot that moves.
+    # Its coordinates are kept as separate ints and its kind and color as
+    # ints, so the collision checks run for every bullet never build lists.
 
-    def __init__(self, dot_color, outside_color, dot_radius, dot_center, dot_velocity, surface, status):
+    __slots__ = ('color', 'outside_color', 'team', 'radius', 'x', 'y', 'previous_x', 'previous_y',
+                 'velocity_x', 'velocity_y', 'status', 'shot_yes')
+
+    def __init__(self, dot_color, outside_color, dot_radius, dot_center, dot_velocity, status):
         # Initialize a Dot.
         # - self is the Dot to initialize
         # - color is the pygame.Color of the dot
-        # - center is a list containing the x and y int
+        # - center is a list or tuple containing the x and y int
         #   coords of the center of the dot
         # - radius is the int pixel radius of the dot
-        # - velocity is a list containing the x and y components
-        # - surface is the window's pygame.Surface object
-        #   status is what type of dot it is
+        # - velocity is a list or tuple containing the x and y components
+        # - status is the Status of the dot, what type of dot it is
 
         self.color = dot_color
         self.outside_color = outside_color
+        self.team = team_of(dot_color)
         self.radius = dot_radius
-        self.center = dot_center
-        self.velocity = dot_velocity
-        self.surface = surface
+        self.x = dot_center[0]
+        self.y = dot_center[1]
+        # center before the last move
+        self.previous_x = self.x
+        self.previous_y = self.y
+        self.velocity_x = dot_velocity[0]
+        self.velocity_y = dot_velocity[1]
         self.status = status
 
         self.shot_yes = False
 
-    def move(self, frames):
+    def move(self, frames, rng=random):
         # Change the location of the Dot by adding the corresponding
         # speed values to the x and y coordinate of its center
         # - self is the Dot
-        if self.status != 'enemy':
-            for i in range(0, 2):
-                self.center[i] += self.velocity[i]
-        else:
-            if random.randint(0, 10) % 2 == 0 and frames % 60 == 0:
-                velocity_options = [[-3, 0], [3, 0], [0, -3], [0, 3]]
-                self.velocity = random.choice(velocity_options)
-            for i in range(0, 2):
-                self.center[i] += self.velocity[i]
-
-    def draw(self):
-        # Draw the dot on the surface
-        # - self is the Dot
-        if self.shot_yes:
-            pass
-        else:
-            pygame.draw.circle(self.surface, self.color,
-                               self.center, self.radius)
-            pygame.draw.circle(self.surface, self.outside_color,
-                               self.center, self.radius, width=3)
+        # - frames is the game frame counter
+        # - rng is the random.Random enemies turn with
+        self.previous_x = self.x
+        self.previous_y = self.y
+        if self.status == ENEMY:
+            if rng.randint(0, 10) % 2 == 0 and frames % 60 == 0:
+                self.velocity_x, self.velocity_y = rng.choice(ENEMY_VELOCITY_CHOICES)
+        self.x += self.velocity_x
+        self.y += self.velocity_y
 
     def set_velocity(self, formula):
         # sets the velocity of the dot
         # formula is a tuple with the (x,y) changes to the dots current velocity
         # self is the dot
-        for i in range(0, 2):
-            self.velocity[i] = formula[i]
+        self.velocity_x = formula[0]
+        self.velocity_y = formula[1]
 
     def get_velocity(self):
-        # gets the velocity of the dot
-        velocity = [3, 3]
-        for i in range(0, 2):
-            velocity[i] *= self.velocity[i]
-        return velocity
+        # gets the velocity of a bullet fired by the dot
+        return [3 * self.velocity_x, 3 * self.velocity_y]
 
     def get_color(self):
         # gets the color of the dot
@@ -395,9 +1119,7 @@ class Dot:
 
     def get_center(self):
         # gets the center coordinates of the dot
-        x = self.center[0]
-        y = self.center[1]
-        return [x, y]
+        return [self.x, self.y]
 
     def get_radius(self):
         # gets the radius of the dot
@@ -415,71 +1137,103 @@ class Dot:
         # sets the color of the dot
         # color is a pygame color
         self.color = color
+        self.team = team_of(color)
 
     def shot(self):
         # makes the dot be shot
         self.shot_yes = True
 
-    def boundary_stop(self):
+    def reset(self, dot_color, outside_color, dot_radius, dot_center, dot_velocity, status):
+        # Reuse the dot as a brand new dot, taking the same arguments as __init__
+        # apart from the surface
+        self.color = dot_color
+        self.outside_color = outside_color
+        self.team = team_of(dot_color)
+        self.radius = dot_radius
+        self.x = self.previous_x = dot_center[0]
+        self.y = self.previous_y = dot_center[1]
+        self.velocity_x = dot_velocity[0]
+        self.velocity_y = dot_velocity[1]
+        self.status = status
+
+        self.shot_yes = False
+
+    def boundary_stop(self, surface_width_height):
         # checks if dot has hit boundary, and stops velocity if it has
-        surface_width_height = (self.surface.get_width(),
-                                self.surface.get_height())
-        for i in range(0, 2):
-            if self.center[i] <= self.radius or self.center[i] + self.radius >= surface_width_height[i]:
-                if self.status == 'player':  # if player, stop movement
-                    self.velocity[i] = 0
-                elif self.status == 'enemy':  # if enemy, bounce
-                    self.velocity[i] = -self.velocity[i]
-
-    def check_bullet_shot(self, other, game_lives):
+        # surface_width_height is the (width, height) of the playing field
+        radius = self.radius
+        if self.x <= radius or self.x + radius >= surface_width_height[0]:
+            if self.status == PLAYER:  # if player, stop movement
+                self.velocity_x = 0
+            elif self.status == ENEMY:  # if enemy, bounce
+                self.velocity_x = -self.velocity_x
+        if self.y <= radius or self.y + radius >= surface_width_height[1]:
+            if self.status == PLAYER:
+                self.velocity_y = 0
+            elif self.status == ENEMY:
+                self.velocity_y = -self.velocity_y
+
+    def check_bullet_shot(self, other, game_lives, max_lives=9):
         # if self is a bullet --> checks if a bullet has hit an enemy
         #   changes self.shot accordingly
-        # returns true is a player was hit by an enemy bullet
-        if self.check_range(other, 'x') and self.check_range(other, 'y'):
+        # returns the number of lives left after the hit, which is at most max_lives
+        radius = self.radius
+        other_radius = other.radius
+        # the same test as check_range(other, 'x') and check_range(other, 'y')
+        if (other.y + other_radius >= self.y - radius and other.y - other_radius <= self.y + radius and
+                other.x + other_radius >= self.x - radius and other.x - other_radius <= self.x + radius):
             if not self.shot_yes:  # if hits opposite color, then other dot dies
-                if self.color == other.get_color() and other.get_status() != 'player':
-                    other.shot()
-                    if game_lives != 9:
+                if self.team == other.team and other.status != PLAYER:
+                    other.shot_yes = True
+                    if game_lives < max_lives:
                         game_lives += 1
-                elif self.color != other.get_color() and other.get_status() == 'player':
+                elif self.team != other.team and other.status == PLAYER:
                     if game_lives > 0:
                         game_lives -= 1
-            if not other.get_shot_status():
-                if self.status != 'player' and self.status != 'player_bullet':
-                    self.shot()  # disapear bullet no matter what as long as other thing is not already shot
+            if not other.shot_yes:
+                if self.status != PLAYER and self.status != PLAYER_BULLET:
+                    self.shot_yes = True  # disapear bullet no matter what as long as other thing is not already shot
         return game_lives
 
     def check_surroundings(self, other):
         # if self is an enemy -- > checks if another dot in extended surroundings (in direction of movement),
         #   returns if yes (bool)
-        if self.status == 'enemy' and not self.shot_yes:
+        if self.status == ENEMY and not self.shot_yes:
+            if other.team == self.team:
+                return False
+            x = self.x
+            y = self.y
+            radius = self.radius
+            other_x = other.x
+            other_y = other.y
+            other_radius = other.radius
             # this whole if statement also checks if enemy moving in the same direction as other dot is detected
             # check left side
             # check that dot is close to enemy
-            if (self.center[0] - self.radius - 20) - (other.get_center()[0] + other.get_radius()) < 0:
-                if self.velocity[0] < 0:  # check that enemy is moving towards dot
+            if (x - radius - 20) - (other_x + other_radius) < 0:
+                if self.velocity_x < 0:  # check that enemy is moving towards dot
                     # check that dot hasn't gone past enemy
-                    if self.center[0] + self.radius > other.get_center()[0] + other.get_radius():
-                        # check that color and vertical coordinates line up
-                        if other.get_color() != self.color and self.check_range(other, 'x'):
+                    if x + radius > other_x + other_radius:
+                        # check that vertical coordinates line up
+                        if self.check_range(other, 'x'):
                             return True
             # check right side
-            if (other.get_center()[0] - other.get_radius()) - (self.center[0] + self.radius + 20) < 0:
-                if self.velocity[0] > 0:
-                    if self.center[0] - self.radius < other.get_center()[0] - other.get_radius():
-                        if other.get_color() != self.color and self.check_range(other, 'x'):
+            if (other_x - other_radius) - (x + radius + 20) < 0:
+                if self.velocity_x > 0:
+                    if x - radius < other_x - other_radius:
+                        if self.check_range(other, 'x'):
                             return True
             # check top side
-            if (self.center[1] - self.radius - 60) - (other.get_center()[1] + other.get_radius()) < 0:
-                if self.velocity[1] > 0:
-                    if self.center[1] + self.radius < other.get_center()[1] + other.get_radius():
-                        if other.get_color() != self.color and self.check_range(other, 'y'):
+            if (y - radius - 60) - (other_y + other_radius) < 0:
+                if self.velocity_y > 0:
+                    if y + radius < other_y + other_radius:
+                        if self.check_range(other, 'y'):
                             return True
             # check bottom side
-            if (other.get_center()[1] - other.get_radius()) - (self.center[1] + self.radius + 20) < 0:
-                if self.velocity[1] < 0:
-                    if self.center[1] - self.radius > other.get_center()[1] - other.get_radius():
-                        if other.get_color() != self.color and self.check_range(other, 'y'):
+            if (other_y - other_radius) - (y + radius + 20) < 0:
+                if self.velocity_y < 0:
+                    if y - radius > other_y - other_radius:
+                        if self.check_range(other, 'y'):
                             return True
             return False
 
@@ -487,17 +1241,1096 @@ class Dot:
         # checks if another dot is in  the surroundings of self
         if side == 'x':  # check vertical coordinates
             # check top side
-            if other.get_center()[1] + other.get_radius() >= self.center[1] - self.radius:
+            if other.y + other.radius >= self.y - self.radius:
                 # check bottom side
-                if other.get_center()[1] - other.get_radius() <= self.center[1] + self.radius:
+                if other.y - other.radius <= self.y + self.radius:
                     return True
         if side == 'y':  # check horizontal coordinates
             # check left side
-            if other.get_center()[0] + other.get_radius() >= self.center[0] - self.radius:
+            if other.x + other.radius >= self.x - self.radius:
                 # check right side
-                if other.get_center()[0] - other.get_radius() <= self.center[0] + self.radius:
+                if other.x - other.radius <= self.x + self.radius:
                     return True
         return False
 
 
-main()
+class ArrayGame(Game):
+    # An object in this class represents a complete game whose enemies and
+    # bullets live in a DotArrays store instead of Dot objects, so moving,
+    # bouncing, turning and hit testing them are batched numpy operations.
+    # The player is still a Dot. player_bullets and enemy_bullets stay empty.
+
+    def __init__(self, surface=None, size=(1000, 800), dirty_rects=False, seed=None):
+        # Initialize an ArrayGame.
+        # - self is the ArrayGame to initialize
+        # - surface, size, dirty_rects and seed are as for Game
+        if numpy is None:
+            raise ImportError('ArrayGame needs numpy to be installed')
+        self.dots = DotArrays()
+        Game.__init__(self, surface, size, dirty_rects, seed)
+        self.checkpoint_kind = 1
+
+    def set_seed(self, seed):
+        # Start the game's random numbers, including the numpy ones, over from seed
+        # - self is the ArrayGame
+        # - seed is an int, or None to pick one at random
+        Game.set_seed(self, seed)
+        self.numpy_random = numpy.random.default_rng(self.seed)
+
+    def create_enemies(self):
+        # Replace the enemies with number_enemies + 1 new enemies placed randomly.
+        # Player bullets are kept.
+        # - self is the ArrayGame to fill with enemies
+        dots = self.dots
+        dots.keep(dots.status[:dots.count] == Status.PLAYER_BULLET)
+        count = self.number_enemies + 1
+        radius = 9
+        width, height = self.surface_size
+        rng = self.numpy_random
+        center = numpy.empty((count, 2), numpy.int64)
+        center[:, 0] = rng.integers(radius, width - radius + 1, count)
+        center[:, 1] = rng.integers(radius, height - radius + 1, count)
+        velocity = ENEMY_VELOCITIES[rng.integers(0, 4, count)]
+        teams = rng.integers(0, 3, count)
+        dots.add_many(teams, radius, center, velocity, Status.ENEMY)
+        self.enemies_left = numpy.bincount(teams, minlength=len(Team))
+
+    def shoot(self, color, center, velocity, status):
+        # Fire a new bullet
+        # - self is the ArrayGame the bullet belongs to
+        # - the other arguments are as for Game.shoot
+        self.dots.add(team_of(color), 5, center, velocity, status)
+
+    def draw_dots(self, alpha=1.0):
+        # Draw the player, then every dot in the store that has not been shot,
+        # and return the list of rects that were drawn on
+        # - self is the ArrayGame to draw
+        # - alpha is as for Game.draw
+        sprites = self.sprites
+        player = self.player_dot
+        player_x = player.x
+        player_y = player.y
+        if alpha != 1.0:
+            player_x = round(player.previous_x + (player_x - player.previous_x) * alpha)
+            player_y = round(player.previous_y + (player_y - player.previous_y) * alpha)
+        blit_list = [(sprites.get(player.color, player.outside_color, player.radius),
+                      (player_x - player.radius, player_y - player.radius))]
+        dots = self.dots
+        count = dots.count
+        visible = numpy.flatnonzero(~dots.shot_yes[:count])
+        centers = dots.center[visible]
+        if alpha != 1.0:
+            previous = dots.previous_center[visible]
+            centers = numpy.rint(previous + (centers - previous) * alpha).astype(numpy.int64)
+        corners = (centers - dots.radius[visible, None]).tolist()
+        radii = dots.radius[visible].tolist()
+        teams = dots.team[visible].tolist()
+        for i in range(len(corners)):
+            color = TEAM_COLORS[teams[i]]
+            blit_list.append((sprites.get(color, color, radii[i]), corners[i]))
+        return self.surface.blits(blit_list)
+
+    def take_snapshot(self, snapshot):
+        # Fill a FrameSnapshot like Game.take_snapshot, copying the dots that
+        # have not been shot straight out of the store
+        # - self is the ArrayGame to copy
+        # - snapshot is the FrameSnapshot to fill
+        self.fill_snapshot_state(snapshot)
+        dots = self.dots
+        visible = numpy.flatnonzero(~dots.shot_yes[:dots.count])
+        count = len(visible) + 1
+        snapshot.reserve(count)
+        rows = snapshot.dots
+        rows[0] = SNAPSHOT_FIELDS(self.player_dot)
+        rows[1:count, 0:2] = dots.center[visible]
+        rows[1:count, 2:4] = dots.previous_center[visible]
+        rows[1:count, 4] = dots.radius[visible]
+        rows[1:count, 5] = dots.team[visible]
+        snapshot.count = count
+
+    def check_collisions(self):
+        # Hit test all bullets at once and apply the hits exactly like
+        # Dot.check_bullet_shot would, then remove the enemies that were shot.
+        # - self is the ArrayGame to check
+        dots = self.dots
+        count = dots.count
+        status = dots.status[:count]
+        player_bullets = numpy.flatnonzero(status == Status.PLAYER_BULLET)
+        shot_enemies = None
+        if len(player_bullets) > 0:
+            enemies = numpy.flatnonzero(status == Status.ENEMY)
+            self.collision_tests += len(player_bullets) * len(enemies)
+            kills = 0
+            killed = numpy.zeros(len(enemies), bool)
+            for start in range(0, len(player_bullets), 256):
+                bullets = player_bullets[start:start + 256]
+                hits = dots.overlap(bullets, enemies)
+                hits &= dots.team[bullets][:, None] == dots.team[enemies][None, :]
+                kills += int(numpy.count_nonzero(hits))
+                killed |= hits.any(axis=0)
+            shot_enemies = enemies[killed]
+            dots.shot_yes[shot_enemies] = True
+            self.game_lives = min(self.max_lives, self.game_lives + kills)
+
+        enemy_bullets = numpy.flatnonzero(status == Status.ENEMY_BULLET)
+        self.collision_tests += len(enemy_bullets)
+        if len(enemy_bullets) > 0:
+            player = self.player_dot
+            px = player.x
+            py = player.y
+            pr = player.radius
+            bullet_x = dots.center[enemy_bullets, 0]
+            bullet_y = dots.center[enemy_bullets, 1]
+            bullet_r = dots.radius[enemy_bullets]
+            hits = ((px + pr >= bullet_x - bullet_r) & (px - pr <= bullet_x + bullet_r) &
+                    (py + pr >= bullet_y - bullet_r) & (py - pr <= bullet_y + bullet_r))
+            harmful = hits & ~dots.shot_yes[enemy_bullets] & (
+                dots.team[enemy_bullets] != player.team)
+            lives = max(0, self.game_lives - int(numpy.count_nonzero(harmful)))
+            self.lives_lost += self.game_lives - lives
+            self.game_lives = lives
+            dots.shot_yes[enemy_bullets[hits]] = True
+
+        if shot_enemies is not None and len(shot_enemies) > 0:
+            self.enemies_shot += len(shot_enemies)
+            self.enemies_left -= numpy.bincount(dots.team[shot_enemies], minlength=len(Team))
+            dots.remove(shot_enemies)
+
+    def count_entities(self):
+        # Return how many dots are still in play and how many bullets are live
+        # - self is the ArrayGame to count
+        dots = self.dots
+        bullets = int(numpy.count_nonzero(dots.status[:dots.count] >= Status.PLAYER_BULLET))
+        return 1 + int(self.enemies_left.sum()), bullets
+
+    def update_entities(self):
+        # Move every game object, let enemies fire and change level when needed.
+        # - self is the ArrayGame to update
+        if self.play_game:
+            self.player_dot.move(self.frame_counter, self.random)
+            self.player_dot.boundary_stop(self.surface_size)
+
+            dots = self.dots
+            dots.move(self.frame_counter, self.numpy_random)
+            dots.boundary_stop(self.surface_size)
+
+            # let enemies that see the player, or randomly chosen ones, fire
+            count = dots.count
+            enemies = numpy.flatnonzero(dots.status[:count] == Status.ENEMY)
+            shooters = enemies[:0]
+            if self.frame_counter % self.enemy_fire_cadence == 0:
+                shooters = enemies[dots.check_surroundings(enemies, self.player_dot)]
+            random_fire = self.numpy_random.integers(
+                0, self.random_fire_odds + 1, len(enemies)) == 1
+            shooters = numpy.concatenate([shooters, enemies[random_fire]])
+            if len(shooters) > 0:
+                # new bullets move on the frame they are fired
+                first = dots.count
+                dots.add_many(dots.team[shooters], 5,
+                              dots.center[shooters] + dots.velocity[shooters] * 3,
+                              dots.velocity[shooters] * 3, Status.ENEMY_BULLET)
+                dots.previous_center[first:dots.count] = dots.center[shooters]
+
+            # check if level should be increased
+            if not self.enemies_left.any():
+                self.level += 1
+                self.game_lives = self.max_lives
+
+                self.number_enemies += self.enemies_per_level
+                self.create_enemies()
+
+                dots.keep(dots.status[:dots.count] != Status.ENEMY_BULLET)
+
+            self.retire_bullets()
+
+        self.frame_counter = self.frame_counter + 1
+
+    def state_hash(self):
+        # Return a short hex digest of everything that changes as the game is
+        # played, like Game.state_hash
+        # - self is the ArrayGame to hash
+        digest = hashlib.blake2b(digest_size=8)
+        player = self.player_dot
+        digest.update(struct.pack('<4i??', self.level, int(self.game_lives), self.frame_counter,
+                                  self.number_enemies, self.play_game, self.continue_game))
+        digest.update(struct.pack('<4iI', player.x, player.y, player.velocity_x,
+                                  player.velocity_y, int(player.color)))
+        dots = self.dots
+        for name in ('center', 'velocity', 'team', 'shot_yes'):
+            digest.update(getattr(dots, name)[:dots.count].tobytes())
+        return digest.hexdigest()
+
+    def save_entities(self, parts):
+        # Add the enemies and bullets to the list of checkpoint parts: their
+        # count, then each of the store's arrays in a compact type, then the
+        # state of the numpy random numbers
+        # - self is the ArrayGame to save
+        # - parts is the list of bytes of the checkpoint so far
+        dots = self.dots
+        count = dots.count
+        parts.append(Checkpoint.counts.pack(count, 0, 0))
+        for name, dtype in Checkpoint.array_types:
+            parts.append(getattr(dots, name)[:count].astype(dtype).tobytes())
+        state = self.numpy_random.bit_generator.state
+        if state['bit_generator'] != 'PCG64':
+            raise ValueError('only PCG64 numpy random numbers can be saved')
+        parts.append(Checkpoint.numpy_random_state.pack(
+            state['state']['state'].to_bytes(16, 'little'), state['state']['inc'].to_bytes(16, 'little'),
+            state['has_uint32'], state['uinteger']))
+
+    def entities_size(self, data, offset):
+        # Return how many bytes the store and numpy random state saved by
+        # save_entities take
+        # - self is the ArrayGame to restore
+        # - data is the checkpoint bytes
+        # - offset is where the enemies and bullets start in data
+        count = Checkpoint.counts.unpack_from(data, offset)[0]
+        row_size = 0
+        for name, dtype in Checkpoint.array_types:
+            row_size += numpy.dtype(dtype).itemsize * int(numpy.prod(getattr(self.dots, name).shape[1:]))
+        return Checkpoint.counts.size + count * row_size + Checkpoint.numpy_random_state.size
+
+    def entities_valid(self, data, offset):
+        # Return whether every dot in the store saved by save_entities is an
+        # enemy or a bullet of one of the teams
+        # - self is the ArrayGame to restore
+        # - data is the checkpoint bytes, already checked by entities_size
+        # - offset is where the enemies and bullets start in data
+        count = Checkpoint.counts.unpack_from(data, offset)[0]
+        offset += Checkpoint.counts.size
+        saved = {}
+        for name, dtype in Checkpoint.array_types:
+            size = count * int(numpy.prod(getattr(self.dots, name).shape[1:]))
+            saved[name] = numpy.frombuffer(data, dtype, size, offset)
+            offset += size * numpy.dtype(dtype).itemsize
+        status = saved['status']
+        team = saved['team']
+        return bool(((status >= ENEMY) & (status <= ENEMY_BULLET) &
+                     (team >= 0) & (team < len(Team))).all())
+
+    def load_entities(self, data, offset):
+        # Restore the enemies and bullets saved by save_entities
+        # - self is the ArrayGame to restore
+        # - data is the checkpoint bytes
+        # - offset is where the enemies and bullets start in data
+        count = Checkpoint.counts.unpack_from(data, offset)[0]
+        offset += Checkpoint.counts.size
+        dots = self.dots
+        dots.count = 0
+        dots.reserve(count)
+        for name, dtype in Checkpoint.array_types:
+            array = getattr(dots, name)
+            shape = (count,) + array.shape[1:]
+            saved = numpy.frombuffer(data, dtype, int(numpy.prod(shape)), offset)
+            array[:count] = saved.reshape(shape)
+            offset += saved.nbytes
+        dots.count = count
+        status = dots.status[:count]
+        live = (status == Status.ENEMY) & ~dots.shot_yes[:count]
+        self.enemies_left = numpy.bincount(dots.team[:count][live], minlength=len(Team))
+        state, inc, has_uint32, uinteger = Checkpoint.numpy_random_state.unpack_from(data, offset)
+        self.numpy_random.bit_generator.state = {
+            'bit_generator': 'PCG64',
+            'state': {'state': int.from_bytes(state, 'little'), 'inc': int.from_bytes(inc, 'little')},
+            'has_uint32': has_uint32,
+            'uinteger': uinteger,
+        }
+
+    def retire_bullets(self):
+        # Remove bullets that left the screen or hit something, then the
+        # oldest bullets when there are still too many, like BulletManager.retire
+        # - self is the ArrayGame
+        dots = self.dots
+        count = dots.count
+        status = dots.status[:count]
+        bullets = status >= Status.PLAYER_BULLET
+        width, height = self.surface_size
+        reach = dots.radius[:count] + BulletManager.margin
+        x = dots.center[:count, 0]
+        y = dots.center[:count, 1]
+        gone = dots.shot_yes[:count] | (x < -reach) | (y < -reach) | (
+            x > width + reach) | (y > height + reach)
+        keep = ~(bullets & gone)
+        # the limits of the empty BulletManagers, so both kinds of game retire alike
+        for manager in (self.player_bullets, self.enemy_bullets):
+            rows = numpy.flatnonzero(keep & (status == manager.status))
+            if len(rows) > manager.limit:
+                keep[rows[:manager.trim]] = False
+        if not keep.all():
+            dots.keep(keep)
+
+
+class DotArrays:
+    # An object in this class stores many dots as parallel numpy arrays, one
+    # row per dot, so they can be moved and tested together
+
+    # the names of the arrays, which all have one row per dot
+    fields = ('center', 'previous_center', 'velocity',
+              'radius', 'team', 'status', 'shot_yes')
+
+    def __init__(self, capacity=64):
+        # Initialize an empty DotArrays.
+        # - self is the DotArrays to initialize
+        # - capacity is how many dots fit before the arrays need to grow
+        self.count = 0
+        self.center = numpy.zeros((capacity, 2), numpy.int64)
+        self.previous_center = numpy.zeros((capacity, 2), numpy.int64)
+        self.velocity = numpy.zeros((capacity, 2), numpy.int64)
+        self.radius = numpy.zeros(capacity, numpy.int64)
+        self.team = numpy.zeros(capacity, numpy.int8)
+        self.status = numpy.zeros(capacity, numpy.int8)
+        self.shot_yes = numpy.zeros(capacity, bool)
+
+    def reserve(self, count):
+        # Make sure there is room for count more dots
+        # - self is the DotArrays
+        needed = self.count + count
+        capacity = len(self.radius)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.fields:
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, team, radius, center, velocity, status):
+        # Add one dot and return its row
+        # - self is the DotArrays
+        # - team is the Team of the dot
+        # - radius is the int pixel radius
+        # - center and velocity are (x, y) pairs
+        # - status is the Status of the dot
+        self.reserve(1)
+        row = self.count
+        self.center[row] = center
+        self.previous_center[row] = center
+        self.velocity[row] = velocity
+        self.radius[row] = radius
+        self.team[row] = team
+        self.status[row] = status
+        self.shot_yes[row] = False
+        self.count = row + 1
+        return row
+
+    def add_many(self, teams, radius, centers, velocities, status):
+        # Add one dot per row of centers
+        # - self is the DotArrays
+        # - teams is an array of Teams, or one Team for all
+        # - radius is the int pixel radius of all the new dots
+        # - centers and velocities are (n, 2) arrays
+        # - status is the Status of all the new dots
+        count = len(centers)
+        self.reserve(count)
+        rows = slice(self.count, self.count + count)
+        self.center[rows] = centers
+        self.previous_center[rows] = centers
+        self.velocity[rows] = velocities
+        self.radius[rows] = radius
+        self.team[rows] = teams
+        self.status[rows] = status
+        self.shot_yes[rows] = False
+        self.count += count
+
+    def keep(self, mask):
+        # Keep only the rows where mask is True, in their current order
+        # - self is the DotArrays
+        # - mask is a bool array with one entry per stored dot
+        rows = numpy.flatnonzero(mask)
+        count = len(rows)
+        for name in self.fields:
+            array = getattr(self, name)
+            array[:count] = array[rows]
+        self.count = count
+
+    def remove(self, rows):
+        # Remove the given rows, keeping the others in order
+        # - self is the DotArrays
+        # - rows is an array of row numbers
+        mask = numpy.ones(self.count, bool)
+        mask[rows] = False
+        self.keep(mask)
+
+    def move(self, frames, rng):
+        # Move every dot by its velocity. Every 60 frames each enemy has a
+        # chance to turn, like Dot.move.
+        # - self is the DotArrays
+        # - frames is the game frame counter
+        # - rng is the numpy random Generator to turn with
+        count = self.count
+        if frames % 60 == 0:
+            enemies = numpy.flatnonzero(self.status[:count] == Status.ENEMY)
+            turn = rng.integers(0, 11, len(enemies)) % 2 == 0
+            choices = rng.integers(0, 4, len(enemies))
+            self.velocity[enemies[turn]] = ENEMY_VELOCITIES[choices[turn]]
+        self.previous_center[:count] = self.center[:count]
+        self.center[:count] += self.velocity[:count]
+
+    def boundary_stop(self, surface_width_height):
+        # Bounce every enemy that has hit the boundary, like Dot.boundary_stop
+        # - self is the DotArrays
+        # - surface_width_height is the (width, height) of the playing field
+        count = self.count
+        enemies = self.status[:count] == Status.ENEMY
+        radius = self.radius[:count, None]
+        center = self.center[:count]
+        hit = (center <= radius) | (center + radius >= surface_width_height)
+        hit &= enemies[:, None]
+        velocity = self.velocity[:count]
+        velocity[hit] = -velocity[hit]
+
+    def overlap(self, rows, other_rows):
+        # Return a bool matrix telling which of rows overlap which of
+        # other_rows, using the same bounding box test as Dot.check_range
+        # - self is the DotArrays
+        # - rows and other_rows are arrays of row numbers
+        x = self.center[rows, 0][:, None]
+        y = self.center[rows, 1][:, None]
+        radius = self.radius[rows][:, None]
+        other_x = self.center[other_rows, 0][None, :]
+        other_y = self.center[other_rows, 1][None, :]
+        other_radius = self.radius[other_rows][None, :]
+        return ((other_y + other_radius >= y - radius) & (other_y - other_radius <= y + radius) &
+                (other_x + other_radius >= x - radius) & (other_x - other_radius <= x + radius))
+
+    def check_surroundings(self, rows, other):
+        # Return a bool array of which of the given enemy rows see the Dot
+        # other ahead of them, like Dot.check_surroundings
+        # - self is the DotArrays
+        # - rows is an array of enemy rows
+        # - other is the Dot to look for
+        center = self.center[rows]
+        velocity = self.velocity[rows]
+        return ~self.shot_yes[rows] & enemies_see(
+            center[:, 0], center[:, 1], velocity[:, 0], velocity[:, 1],
+            self.radius[rows], self.team[rows], other)
+
+
+class SpatialGrid:
+    # An object in this class is a uniform grid that indexes dots by the
+    # cells their bounding boxes cover, so nearby dots can be found quickly
+
+    def __init__(self, cell_size):
+        # Initialize a SpatialGrid.
+        # - self is the SpatialGrid to initialize
+        # - cell_size is the int pixel width and height of each cell
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def rebuild(self, dots):
+        # Index every dot in dots by position in the list.
+        # - self is the SpatialGrid
+        # - dots is the list of Dots to index
+        cells = {}
+        size = self.cell_size
+        for index in range(len(dots)):
+            dot = dots[index]
+            x = dot.x
+            y = dot.y
+            radius = dot.radius
+            for cell_x in range((x - radius) // size, (x + radius) // size + 1):
+                for cell_y in range((y - radius) // size, (y + radius) // size + 1):
+                    cell = cells.get((cell_x, cell_y))
+                    if cell is None:
+                        cells[(cell_x, cell_y)] = [index]
+                    else:
+                        cell.append(index)
+        self.cells = cells
+
+    def query(self, dot):
+        # Return the sorted indexes of the indexed dots whose cells overlap the
+        # bounding box of dot. Every dot that check_range could match is included.
+        # - self is the SpatialGrid
+        # - dot is the Dot to look around
+        cells = self.cells
+        size = self.cell_size
+        x = dot.x
+        y = dot.y
+        radius = dot.radius
+        first_x = (x - radius) // size
+        last_x = (x + radius) // size
+        first_y = (y - radius) // size
+        last_y = (y + radius) // size
+        if first_x == last_x and first_y == last_y:
+            return cells.get((first_x, first_y), [])
+        found = set()
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                cell = cells.get((cell_x, cell_y))
+                if cell is not None:
+                    found.update(cell)
+        return sorted(found)
+
+
+class BulletManager:
+    # An object in this class keeps the live bullets of one kind in the order
+    # they were fired, plus a pool of retired bullet Dots to reuse
+
+    # how far past the edge of the screen a bullet can go before it is retired
+    margin = 20
+
+    def __init__(self, status, limit, trim, pool_size=64):
+        # Initialize a BulletManager with a pool of ready-made bullets.
+        # - self is the BulletManager to initialize
+        # - status is PLAYER_BULLET or ENEMY_BULLET
+        # - limit is the most live bullets kept; past it the oldest trim
+        #   bullets are retired
+        # - pool_size is how many bullets to create up front
+        self.status = status
+        self.limit = limit
+        self.trim = trim
+        self.live = []
+        self.pool = []
+        for i in range(pool_size):
+            self.pool.append(Dot(None, None, 5, (0, 0), (0, 0), status))
+
+    def __iter__(self):
+        return iter(self.live)
+
+    def __len__(self):
+        return len(self.live)
+
+    def fire(self, color, center, velocity):
+        # Start a new live bullet, reusing a pooled one when there is one
+        # - self is the BulletManager
+        # - color is the pygame.Color of the bullet
+        # - center and velocity are [x, y] lists for the new bullet
+        if len(self.pool) > 0:
+            bullet = self.pool.pop()
+            bullet.reset(color, color, 5, center, velocity, self.status)
+        else:
+            bullet = Dot(color, color, 5, center, velocity, self.status)
+        self.live.append(bullet)
+
+    def retire(self, surface_width_height):
+        # Return bullets that have been shot or have left the screen to the
+        # pool. They can never hit anything again, since bullets move in a
+        # straight line. Then, if there are still more than limit bullets,
+        # retire the oldest trim of them.
+        # - self is the BulletManager
+        # - surface_width_height is the (width, height) of the playing field
+        width, height = surface_width_height
+        pool = self.pool
+        kept = []
+        for bullet in self.live:
+            x = bullet.x
+            y = bullet.y
+            reach = bullet.radius + self.margin
+            if bullet.shot_yes or x < -reach or y < -reach or x > width + reach or y > height + reach:
+                pool.append(bullet)
+            else:
+                kept.append(bullet)
+        if len(kept) > self.limit:
+            pool.extend(kept[:self.trim])
+            del kept[:self.trim]
+        self.live = kept
+
+    def clear(self):
+        # Retire every live bullet
+        # - self is the BulletManager
+        self.pool.extend(self.live)
+        self.live = []
+
+
+class TextCache:
+    # An object in this class remembers fonts and rendered text so each font
+    # is only created once and each piece of text is only rendered once
+
+    def __init__(self, max_surfaces=64):
+        # Initialize an empty TextCache.
+        # - self is the TextCache to initialize
+        # - max_surfaces is how many rendered texts to keep; past it the least
+        #   recently used one is forgotten
+        self.max_surfaces = max_surfaces
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+    def get_font(self, font_size):
+        # Return the default font at font_size, creating it the first time.
+        # This is the font SysFont("") gives, without scanning the system fonts.
+        # - self is the TextCache
+        # - font_size is the int size of the font
+        font = self.fonts.get(font_size)
+        if font is None:
+            if not pygame.font.get_init():
+                # games drawn off screen may never have started pygame.font
+                pygame.font.init()
+            font = pygame.font.Font(None, font_size)
+            self.fonts[font_size] = font
+        return font
+
+    def render(self, text, font_size, fg_color, bg_color):
+        # Return a surface with text rendered on it, like pygame.font.Font.render
+        # with antialiasing
+        # - self is the TextCache
+        # - text is the string to render
+        # - font_size is the int size of the font
+        # - fg_color and bg_color are the pygame.Colors of the text and background
+        key = (font_size, text, tuple(fg_color), tuple(bg_color))
+        surfaces = self.surfaces
+        text_box = surfaces.get(key)
+        if text_box is not None:
+            surfaces.move_to_end(key)
+            return text_box
+        text_box = self.get_font(font_size).render(
+            text, True, fg_color, bg_color)
+        surfaces[key] = text_box
+        if len(surfaces) > self.max_surfaces:
+            surfaces.popitem(last=False)
+        return text_box
+
+
+class SpriteAtlas:
+    # An object in this class holds one pre-drawn surface for every look a
+    # dot can have, so drawing a dot is a single blit
+
+    # the color used for the transparent corners of each sprite
+    colorkey = pygame.Color(255, 0, 255)
+
+    def __init__(self):
+        # Initialize an empty SpriteAtlas.
+        # - self is the SpriteAtlas to initialize
+        self.sprites = {}
+
+    def get(self, color, outside_color, radius):
+        # Return the sprite of a dot, drawing it the first time it is needed.
+        # Blitting it at (x - radius, y - radius) gives the same pixels as Dot.draw.
+        # - self is the SpriteAtlas
+        # - color and outside_color are the fill and outline pygame.Colors
+        # - radius is the int pixel radius
+        key = (int(color), int(outside_color), radius)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((radius * 2, radius * 2))
+            sprite.fill(self.colorkey)
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            pygame.draw.circle(sprite, outside_color,
+                               (radius, radius), radius, width=3)
+            sprite.set_colorkey(self.colorkey, pygame.RLEACCEL)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert()
+            self.sprites[key] = sprite
+        return sprite
+
+
+class FrameSnapshot:
+    # An object in this class is a copy of everything Game.draw needs to show
+    # one frame. In pipelined play the simulation thread fills one while the
+    # main thread draws the other, and they swap once a frame.
+    # The dots are rows of x, y, previous x, previous y, radius and team,
+    # the player first.
+
+    def __init__(self, capacity=256):
+        # Initialize an empty FrameSnapshot.
+        # - self is the FrameSnapshot to initialize
+        # - capacity is how many dots fit before the array needs to grow
+        self.play_game = False
+        self.continue_game = True
+        self.level = 1
+        self.game_lives = 0
+        self.max_lives = 0
+        self.end_game_reason = None
+        self.player_color = None
+        self.player_outside_color = None
+        self.alpha = 1.0  # how far between the last two updates to draw the dots
+        self.entities = 0
+        self.bullets = 0
+        self.collision_tests = 0
+        self.count = 0
+        self.dots = numpy.zeros((capacity, 6), numpy.int64)
+
+    def reserve(self, count):
+        # Make sure there is room for count dots, forgetting the dots held
+        # - self is the FrameSnapshot
+        capacity = len(self.dots)
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        self.dots = numpy.zeros((capacity, 6), numpy.int64)
+
+    def count_entities(self):
+        # Return the counts of the game when the snapshot was taken, like
+        # Game.count_entities, so a FrameProfiler can end a frame with it
+        # - self is the FrameSnapshot
+        return self.entities, self.bullets
+
+
+class FrameProfiler:
+    # An object in this class times the parts of every frame while it is
+    # turned on, and keeps the samples to show on screen or save. In
+    # pipelined play, 'update' is the time the main thread waits for the
+    # simulation thread, and the 'collisions' spans are added by the
+    # simulation thread for the ticks it is running meanwhile, so they are
+    # not nested inside that frame's 'update' and can overlap 'draw'.
+
+    # the parts of a frame, in the order they are shown
+    sections = ('handle_events', 'update', 'collisions', 'draw', 'display_update')
+    short_names = ('ev', 'upd', 'col', 'draw', 'flip')
+
+    def __init__(self, enabled=False, max_samples=36000, window=60):
+        # Initialize a FrameProfiler.
+        # - self is the FrameProfiler to initialize
+        # - enabled is True to start timing right away
+        # - max_samples is how many frames to keep; older ones are forgotten
+        # - window is how many frames the on-screen averages cover
+        self.enabled = enabled
+        self.samples = deque(maxlen=max_samples)
+        self.window = window
+        self.frame_index = 0
+        self.spans = []
+        self.last_time = 0.0
+        self.lines = ['profiling...']
+
+    def toggle(self):
+        # Turn the profiler on if it is off, or off if it is on
+        # - self is the FrameProfiler
+        self.enabled = not self.enabled
+
+    def start_frame(self):
+        # Start timing a new frame
+        # - self is the FrameProfiler
+        self.spans = []
+        self.last_time = time.perf_counter()
+
+    def mark(self, section):
+        # Record that section ran from the last mark until now
+        # - self is the FrameProfiler
+        # - section is one of sections
+        now = time.perf_counter()
+        self.spans.append((section, self.last_time, now))
+        self.last_time = now
+
+    def add_span(self, section, start, end):
+        # Record that section ran from start until end, inside another section,
+        # or on the simulation thread in pipelined play
+        # - self is the FrameProfiler
+        # - start and end are time.perf_counter values
+        self.spans.append((section, start, end))
+
+    def end_frame(self, game):
+        # Finish the frame, saving its times together with game's counts
+        # - self is the FrameProfiler
+        # - game is the Game that was played
+        entities, bullets = game.count_entities()
+        self.samples.append((self.frame_index, self.spans, entities,
+                             bullets, game.collision_tests))
+        game.collision_tests = 0
+        self.frame_index += 1
+        if self.frame_index % 15 == 0:
+            self.lines = self.summarize()
+
+    def frame_times(self, spans):
+        # Return the seconds spent in each of sections during a frame
+        # - self is the FrameProfiler
+        # - spans is the list of (section, start, end) of the frame
+        times = dict.fromkeys(self.sections, 0.0)
+        for section, start, end in spans:
+            times[section] += end - start
+        return [times[section] for section in self.sections]
+
+    def summarize(self):
+        # Return the lines of text for the overlay: the average milliseconds
+        # of each section and the latest counts over the last window frames
+        # - self is the FrameProfiler
+        # newest first, without copying the older samples
+        recent = list(islice(reversed(self.samples), self.window))
+        totals = [0.0] * len(self.sections)
+        for sample in recent:
+            times = self.frame_times(sample[1])
+            for i in range(len(totals)):
+                totals[i] += times[i]
+        parts = []
+        for i in range(len(totals)):
+            parts.append('{} {:.2f}'.format(self.short_names[i], totals[i] / len(recent) * 1000))
+        index, spans, entities, bullets, tests = recent[0]
+        return [' '.join(parts) + ' ms',
+                '{} dots  {} bullets  {} tests'.format(entities, bullets, tests)]
+
+    def overlay_lines(self):
+        # Return the lines of text to show on screen
+        # - self is the FrameProfiler
+        return self.lines
+
+    def write_csv(self, path):
+        # Save one row per frame with the milliseconds of every section and
+        # the counts to the CSV file path. In pipelined play the collisions
+        # column is the simulation thread's and is not part of update.
+        # - self is the FrameProfiler
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame'] + [section + '_ms' for section in self.sections] +
+                            ['entities', 'bullets', 'collision_tests'])
+            for index, spans, entities, bullets, tests in self.samples:
+                times = ['{:.4f}'.format(seconds * 1000) for seconds in self.frame_times(spans)]
+                writer.writerow([index] + times + [entities, bullets, tests])
+
+    def write_trace(self, path):
+        # Save every section of every frame as a Chrome trace JSON file at path,
+        # which chrome://tracing and Perfetto can open. In pipelined play the
+        # collisions spans run on the simulation thread, so they are not
+        # nested inside update and may overlap draw.
+        # - self is the FrameProfiler
+        events = []
+        for index, spans, entities, bullets, tests in self.samples:
+            for section, start, end in spans:
+                events.append({'name': section, 'ph': 'X', 'pid': 1, 'tid': 1,
+                               'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                               'args': {'frame': index}})
+            if len(spans) > 0:
+                events.append({'name': 'counts', 'ph': 'C', 'pid': 1, 'tid': 1, 'ts': spans[0][1] * 1e6,
+                               'args': {'entities': entities, 'bullets': bullets, 'collision_tests': tests}})
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+class FrameCapture:
+    # An object in this class saves the frames drawn, or every k-th one, as
+    # PNG files or as one raw file of pixels, from a writer thread. Each
+    # captured frame is blitted into one of a few pooled surfaces and queued
+    # for the writer; when the writer falls behind and no surface is free,
+    # the frame is dropped instead of making the game wait. If the writer
+    # fails, capturing stops and close raises the writer's exception.
+
+    formats = ('png', 'raw')
+
+    def __init__(self, directory, every=1, file_format='png', slots=8):
+        # Initialize a FrameCapture and start its writer thread.
+        # - self is the FrameCapture to initialize
+        # - directory is where to save the frames, created if needed
+        # - every is to capture every this many frames
+        # - file_format is 'png' for one PNG file per frame, or 'raw' for all
+        #   frames' pixels in frames.raw, described by capture.json
+        # - slots is how many frames can wait for the writer
+        if file_format not in self.formats:
+            raise ValueError('capture format must be one of {}'.format(', '.join(self.formats)))
+        self.directory = directory
+        self.every = max(1, every)
+        self.file_format = file_format
+        self.slots = slots
+        self.free = deque()  # pooled surfaces ready to be captured into
+        # room for every pooled surface and the None that stops the writer
+        self.pending = queue.Queue(maxsize=slots + 1)
+        self.captured = 0
+        self.dropped = 0
+        self.frames = []  # the numbers of the frames written, in order
+        self.description = None  # the pixel format of the raw frames
+        self.error = None  # the exception that stopped the writer, if any
+        os.makedirs(directory, exist_ok=True)
+        self.writer = threading.Thread(target=self.write_frames, name='treason capture', daemon=True)
+        self.writer.start()
+
+    def grab(self, surface, frame):
+        # Capture surface as frame number frame if it is one to capture,
+        # without waiting for the writer
+        # - self is the FrameCapture
+        # - surface is the pygame.Surface that was just shown
+        # - frame is the int number of the frame
+        if frame % self.every != 0 or self.error is not None:
+            return
+        if self.description is None:
+            # the pool is made the first time, in the format of the surface
+            for i in range(self.slots):
+                self.free.append(surface.copy())
+            self.description = {
+                'width': surface.get_width(),
+                'height': surface.get_height(),
+                'pitch': surface.get_pitch(),
+                'bytes_per_pixel': surface.get_bytesize(),
+                'masks': list(surface.get_masks()),
+            }
+        if len(self.free) == 0:
+            self.dropped += 1
+            return
+        slot = self.free.popleft()
+        slot.blit(surface, (0, 0))
+        self.pending.put_nowait((frame, slot))
+        self.captured += 1
+
+    def write_frames(self):
+        # Run on the writer thread: save each queued frame and put its surface
+        # back in the pool, until a None is queued or saving a frame fails
+        # - self is the FrameCapture
+        raw_file = None
+        try:
+            if self.file_format == 'raw':
+                raw_file = open(os.path.join(self.directory, 'frames.raw'), 'wb')
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    return
+                frame, slot = item
+                if raw_file is not None:
+                    # write straight from the surface's pixels without copying them
+                    pixels = slot.get_buffer()
+                    raw_file.write(pixels)
+                    del pixels
+                else:
+                    pygame.image.save(slot, os.path.join(self.directory, 'frame_{:06d}.png'.format(frame)))
+                self.frames.append(frame)
+                self.free.append(slot)
+        except Exception as error:
+            # keep the error for close, since nothing catches it on this thread
+            self.error = error
+        finally:
+            if raw_file is not None:
+                raw_file.close()
+
+    def close(self):
+        # Wait for the writer to save every queued frame, then save
+        # capture.json describing the capture and raise the exception that
+        # stopped the writer, if one did
+        # - self is the FrameCapture
+        self.pending.put(None)
+        self.writer.join()
+        info = {
+            'format': self.file_format,
+            'every': self.every,
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'frames': self.frames,
+        }
+        if self.description is not None:
+            info.update(self.description)
+        if self.error is not None:
+            info['error'] = repr(self.error)
+        with open(os.path.join(self.directory, 'capture.json'), 'w') as file:
+            json.dump(info, file, indent=2)
+        if self.error is not None:
+            raise self.error
+
+    def report(self):
+        # Return a line saying how many frames were captured and dropped
+        # - self is the FrameCapture
+        return 'captured {} frames to {}, dropped {}'.format(self.captured, self.directory, self.dropped)
+
+
+class Checkpoint:
+    # The binary format of Game.save_state. A checkpoint starts with the
+    # magic bytes, the format version, the kind of game and the field size.
+    # Then come the game's numbers and settings, the state of its random
+    # numbers and the player. Last come the enemies and bullets: counts and
+    # one record per Dot for a Game, or the DotArrays store and the numpy
+    # random state for an ArrayGame. Everything is little-endian.
+
+    header = struct.Struct('<4sHBHH')
+    # seed, level, lives, frame counter, number of enemies, the four balance
+    # settings, play_game, continue_game and the index of end_game_reason
+    numbers = struct.Struct('<QiiQiiiii??B')
+    # the Mersenne Twister state of random.Random.getstate and its saved gauss value
+    random_state = struct.Struct('<625I?d')
+    numpy_random_state = struct.Struct('<16s16sBI')
+    counts = struct.Struct('<III')
+    # color, outside color, x, y, previous x, previous y, velocity x and y,
+    # radius, status and shot_yes
+    dot = struct.Struct('<II6iBB?')
+    # the DotArrays arrays and the types they are saved as
+    array_types = (('center', '<i4'), ('previous_center', '<i4'), ('velocity', '<i4'),
+                   ('radius', 'u1'), ('team', 'i1'), ('status', 'i1'), ('shot_yes', '?'))
+    magic = b'TRCK'
+    version = 1
+    kinds = ('Game', 'ArrayGame')
+    end_reasons = (None, 'lives gone', 'all dead')
+
+    @staticmethod
+    def dot_fields(dot):
+        # Return the values of a Dot in the order of the dot record
+        return (int(dot.color), int(dot.outside_color), dot.x, dot.y, dot.previous_x,
+                dot.previous_y, dot.velocity_x, dot.velocity_y, dot.radius, dot.status, dot.shot_yes)
+
+    @staticmethod
+    def restore_dot(dot, record):
+        # Set every value of a Dot from a dot record
+        # - dot is the Dot to set
+        # - record is the tuple unpacked from the dot record
+        (color, outside_color, x, y, previous_x, previous_y, velocity_x, velocity_y,
+         radius, status, shot_yes) = record
+        dot.reset(pygame.Color(color), pygame.Color(outside_color), radius, (x, y),
+                  (velocity_x, velocity_y), Status(status))
+        dot.previous_x = previous_x
+        dot.previous_y = previous_y
+        dot.shot_yes = shot_yes
+
+
+class InputRecorder:
+    # An object in this class remembers which keys were pressed on which
+    # frame of a game, so the game can be replayed exactly
+
+    # the file starts with the magic bytes, the format version, the seed, the
+    # field size, the last frame and the number of keys, then holds one
+    # (frame, key) pair per key
+    header = struct.Struct('<4sHQHHII')
+    entry = struct.Struct('<II')
+    magic = b'TRIN'
+    version = 1
+
+    def __init__(self, seed, size):
+        # Initialize an empty InputRecorder.
+        # - self is the InputRecorder to initialize
+        # - seed is the int seed of the recorded game
+        # - size is the (width, height) of the recorded game
+        self.seed = seed
+        self.size = size
+        self.keys = []
+
+    def record(self, frame, key):
+        # Remember that key was pressed before frame frame
+        # - self is the InputRecorder
+        self.keys.append((frame, key))
+
+    def save(self, path, end_frame):
+        # Write the recording to the file path
+        # - self is the InputRecorder
+        # - end_frame is the frame counter when the recorded game stopped
+        with open(path, 'wb') as file:
+            file.write(self.header.pack(self.magic, self.version, self.seed, self.size[0],
+                                        self.size[1], end_frame, len(self.keys)))
+            for frame, key in self.keys:
+                file.write(self.entry.pack(frame, key))
+
+    @classmethod
+    def load(cls, path):
+        # Read a recording from the file path and return its seed, size, last
+        # frame and list of (frame, key) pairs
+        # - cls is InputRecorder
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, seed, width, height, end_frame, count = cls.header.unpack_from(data)
+        if magic != cls.magic or version != cls.version:
+            raise ValueError('{} is not a treason recording'.format(path))
+        keys = list(cls.entry.iter_unpack(
+            data[cls.header.size:cls.header.size + count * cls.entry.size]))
+        return seed, (width, height), end_frame, keys
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='a single player game where you have to shoot your own team to win')
+    parser.add_argument('--seed', type=int, help='seed for the random numbers of the game')
+    parser.add_argument('--record', metavar='PATH', help='save the keys you press to PATH')
+    parser.add_argument('--replay', metavar='PATH', help='replay a recording as fast as possible instead of playing')
+    parser.add_argument('--render', action='store_true', help='draw the replay in a window')
+    parser.add_argument('--hashes', metavar='PATH', help='write the state hash of every replayed frame to PATH')
+    parser.add_argument('--frames', type=int, metavar='N', help='quit after drawing N frames, to time startup')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='update the game on a second thread while frames are drawn')
+    parser.add_argument('--load', metavar='PATH', help='start from a checkpoint saved with --save')
+    parser.add_argument('--save', metavar='PATH', help='save a checkpoint of the game to PATH on quitting')
+    args = parser.parse_args()
+    if args.load is not None and args.record is not None:
+        parser.error('--record cannot be used with --load, since a replay starts from the seed')
+    if args.replay is not None:
+        start = time.perf_counter()
+        game, hashes = replay(args.replay, args.render)
+        seconds = time.perf_counter() - start
+        print('replayed {} frames in {:.2f} s ({:.0f} frames per second)'.format(
+            len(hashes), seconds, len(hashes) / max(seconds, 1e-9)))
+        print('level {}, lives {}, final state {}'.format(
+            game.level, game.game_lives, hashes[-1] if hashes else game.state_hash()))
+        if args.hashes is not None:
+            with open(args.hashes, 'w') as file:
+                for frame_hash in hashes:
+                    file.write(frame_hash + '\n')
+    else:
+        main(args.seed, args.record, args.frames, args.pipeline, args.load, args.save)
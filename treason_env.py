@@ -0,0 +1,341 @@
+# Treason environments
+# a reset/step interface over Game for automated players. Actions are the
+# game's keys, observations are numpy arrays of the player, the nearest
+# enemies and the nearest enemy bullets, and VectorEnv steps many games in
+# lockstep, optionally split over worker processes.
+#
+# usage: env = TreasonEnv(seed=0)
+#        observation = env.reset()
+#        observation, reward, done, info = env.step(ACTION_NAMES.index('space'))
+#
+#        envs = VectorEnv(64, workers=4, seed=0)
+#        observations = envs.reset()
+#        observations, rewards, dones, infos = envs.step(actions)
+#
+#        python treason_env.py --envs 64 --workers 4  (times env steps per second)
+
+import argparse
+import multiprocessing
+import os
+import time
+from itertools import chain
+from operator import attrgetter
+
+# environments never open a window or need the pygame banner
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy
+import pygame
+import treason
+
+
+# User-defined functions
+
+def main():
+    parser = argparse.ArgumentParser(description='time random play in many treason environments')
+    parser.add_argument('--envs', type=int, default=64, help='games to step in lockstep')
+    parser.add_argument('--workers', type=int, default=0, help='processes to split the games over, 0 for none')
+    parser.add_argument('--steps', type=int, default=2000, help='steps of all the games to time')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='game', help='which kind of Game to play')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game; the rest count up from it')
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(args.seed)
+    with VectorEnv(args.envs, workers=args.workers, seed=args.seed,
+                   game_class=BACKENDS[args.backend]) as envs:
+        envs.reset()
+        episodes = 0
+        start = time.perf_counter()
+        for i in range(args.steps):
+            actions = rng.integers(0, len(ACTIONS), args.envs)
+            observations, rewards, dones, infos = envs.step(actions)
+            episodes += int(dones.sum())
+        seconds = time.perf_counter() - start
+    print('{} env steps in {:.2f} s, {:.0f} steps per second, {} episodes finished'.format(
+        args.envs * args.steps, seconds, args.envs * args.steps / seconds, episodes))
+
+
+def entity_arrays(game):
+    # Return the live enemies and enemy bullets of game as two (n, 3) int
+    # arrays of x, y and team
+    # - game is the Game or ArrayGame to look in
+    if isinstance(game, treason.ArrayGame):
+        dots = game.dots
+        count = dots.count
+        status = dots.status[:count]
+        live = ~dots.shot_yes[:count]
+        arrays = []
+        for wanted in (treason.Status.ENEMY, treason.Status.ENEMY_BULLET):
+            rows = numpy.flatnonzero(live & (status == wanted))
+            arrays.append(numpy.column_stack((dots.center[rows], dots.team[rows])))
+        return arrays[0], arrays[1]
+    arrays = []
+    for dots in (game.enemy_dots, game.enemy_bullets):
+        count = len(dots)
+        fields = numpy.fromiter(chain.from_iterable(map(POSITION_FIELDS, dots)), numpy.int64, 3 * count)
+        arrays.append(fields.reshape(count, 3))
+    return arrays[0], arrays[1]
+
+
+def nearest(entities, x, y, limit):
+    # Return a (limit, 3) float32 array of the limit entities nearest to
+    # (x, y), nearest first, padded with rows of team -1
+    # - entities is an (n, 3) int array of x, y and team
+    # - x and y are the int pixel position to measure from
+    # - limit is how many rows to return
+    result = numpy.zeros((limit, 3), numpy.float32)
+    result[:, 2] = -1
+    if len(entities) == 0:
+        return result
+    distance = numpy.abs(entities[:, 0] - x) + numpy.abs(entities[:, 1] - y)
+    if len(entities) > limit:
+        rows = numpy.argpartition(distance, limit)[:limit]
+        rows = rows[numpy.argsort(distance[rows], kind='stable')]
+    else:
+        rows = numpy.argsort(distance, kind='stable')
+    result[:len(rows)] = entities[rows]
+    return result
+
+
+def stack(observations):
+    # Return one observation whose arrays stack those of a list of observations
+    return {name: numpy.stack([observation[name] for observation in observations])
+            for name in OBSERVATION_NAMES}
+
+
+def step_all(envs, actions):
+    # Step each env with its action, resetting those whose episode ended,
+    # and return the stacked observations, the rewards, the dones and the
+    # infos. The info of an env that was reset holds its last observation
+    # as 'final_observation'.
+    # - envs is a list of TreasonEnvs
+    # - actions is a sequence of int actions, one per env
+    observations = []
+    rewards = numpy.zeros(len(envs), numpy.float32)
+    dones = numpy.zeros(len(envs), bool)
+    infos = []
+    for i in range(len(envs)):
+        observation, rewards[i], dones[i], info = envs[i].step(int(actions[i]))
+        if dones[i]:
+            info['final_observation'] = observation
+            observation = envs[i].reset()
+        observations.append(observation)
+        infos.append(info)
+    return stack(observations), rewards, dones, infos
+
+
+def run_shard(connection, options_list):
+    # Serve reset, step and close commands for one shard of a VectorEnv in a
+    # worker process until told to close
+    # - connection is this end of the pipe to the VectorEnv
+    # - options_list is a list of TreasonEnv keyword arguments, one per env
+    envs = [TreasonEnv(**options) for options in options_list]
+    while True:
+        command, data = connection.recv()
+        if command == 'reset':
+            connection.send(stack([env.reset() for env in envs]))
+        elif command == 'step':
+            connection.send(step_all(envs, data))
+        elif command == 'close':
+            connection.close()
+            return
+
+
+class TreasonEnv:
+    # An object in this class is one game played without a window, one
+    # action at a time.
+    # Each step presses the action's key, then plays frame_skip frames.
+    # The reward is the enemies shot, plus LEVEL_REWARD for each level
+    # finished, minus the lives taken by enemy bullets. Lives lost are
+    # counted hit by hit, so the life a kill gives back does not hide them,
+    # and lives lost on the step a level ends still count. An episode is
+    # done when the lives run out or after max_frames frames.
+
+    def __init__(self, game_class=treason.Game, seed=None, seed_step=1, frame_skip=1,
+                 max_frames=20000, max_enemies=32, max_bullets=32, settings=None):
+        # Initialize a TreasonEnv.
+        # - self is the TreasonEnv to initialize
+        # - game_class is Game or ArrayGame
+        # - seed is the seed of the first episode, or None for random episodes
+        # - seed_step is how much the seed goes up for each later episode
+        # - frame_skip is how many frames each step plays
+        # - max_frames is the most frames an episode can last
+        # - max_enemies and max_bullets are how many of the nearest enemies
+        #   and enemy bullets the observations hold
+        # - settings is an optional dict of Game balance settings to change
+        self.game_class = game_class
+        self.next_seed = seed
+        self.seed_step = seed_step
+        self.frame_skip = frame_skip
+        self.max_frames = max_frames
+        self.max_enemies = max_enemies
+        self.max_bullets = max_bullets
+        self.settings = settings or {}
+        self.game = None
+
+    def reset(self, seed=None):
+        # Start a new episode and return its first observation
+        # - self is the TreasonEnv
+        # - seed is the seed of the new game, or None to use the next one
+        if seed is not None:
+            self.next_seed = seed
+        game = self.game_class(seed=self.next_seed)
+        if self.next_seed is not None:
+            self.next_seed += self.seed_step
+        for name, value in self.settings.items():
+            setattr(game, name, value)
+        game.game_lives = game.max_lives
+        game.handle_key(pygame.K_m)
+        self.game = game
+        return self.observe()
+
+    def step(self, action):
+        # Press the key of action, play frame_skip frames and return the
+        # observation, the reward, whether the episode is done and an info
+        # dict of the level, lives, frame and whether it was cut off at
+        # max_frames
+        # - self is the TreasonEnv
+        # - action is an int index into ACTIONS
+        game = self.game
+        key = ACTIONS[action]
+        if key is not None:
+            game.handle_key(key)
+        level = game.level
+        enemies_shot = game.enemies_shot
+        lives_lost = game.lives_lost
+        game.step(self.frame_skip)
+
+        reward = (game.enemies_shot - enemies_shot + LEVEL_REWARD * (game.level - level)
+                  - (game.lives_lost - lives_lost))
+        truncated = game.frame_counter >= self.max_frames
+        done = truncated or not game.continue_game
+        info = {'level': game.level, 'lives': game.game_lives,
+                'frame': game.frame_counter, 'truncated': truncated}
+        return self.observe(), float(reward), done, info
+
+    def observe(self):
+        # Return the observation of the game: a dict of float32 arrays
+        # 'player' of x, y, team, lives and level, and 'enemies' and
+        # 'enemy_bullets' of the x, y and team of the nearest ones, nearest
+        # first, padded with rows of team -1. Positions are in pixels.
+        # - self is the TreasonEnv
+        game = self.game
+        player = game.player_dot
+        enemies, enemy_bullets = entity_arrays(game)
+        return {
+            'player': numpy.array([player.x, player.y, player.team, game.game_lives, game.level], numpy.float32),
+            'enemies': nearest(enemies, player.x, player.y, self.max_enemies),
+            'enemy_bullets': nearest(enemy_bullets, player.x, player.y, self.max_bullets),
+        }
+
+
+class VectorEnv:
+    # An object in this class steps n TreasonEnvs in lockstep, either in this
+    # process or split into shards over worker processes. Envs whose episode
+    # ends are reset right away.
+
+    def __init__(self, n, workers=0, seed=None, **options):
+        # Initialize a VectorEnv.
+        # - self is the VectorEnv to initialize
+        # - n is how many envs to step
+        # - workers is how many processes to split the envs over, 0 to step
+        #   them all in this process
+        # - seed is the seed of the first env's first episode; env i starts
+        #   at seed + i and every episode of every env gets its own seed
+        # - options are TreasonEnv keyword arguments shared by every env
+        options_list = []
+        for i in range(n):
+            env_options = dict(options)
+            if seed is not None:
+                env_options['seed'] = seed + i
+                env_options['seed_step'] = n
+            options_list.append(env_options)
+        self.n = n
+        self.envs = []
+        self.connections = []
+        self.processes = []
+        if workers <= 0:
+            self.envs = [TreasonEnv(**env_options) for env_options in options_list]
+            return
+        workers = min(workers, n)
+        for shard in range(workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_shard, args=(child, options_list[shard::workers]), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        # env i is in shard i % workers; order maps shard-major back to env order
+        shard_order = []
+        for shard in range(workers):
+            shard_order.extend(range(shard, n, workers))
+        self.order = numpy.argsort(shard_order)
+
+    def reset(self):
+        # Start a new episode in every env and return the stacked observations
+        # - self is the VectorEnv
+        if self.envs:
+            return stack([env.reset() for env in self.envs])
+        for connection in self.connections:
+            connection.send(('reset', None))
+        return self.gather([connection.recv() for connection in self.connections])
+
+    def step(self, actions):
+        # Step every env with its action and return the stacked observations,
+        # a float32 array of rewards, a bool array of dones and a list of info
+        # dicts, as step_all does
+        # - self is the VectorEnv
+        # - actions is a sequence of n int actions
+        if self.envs:
+            return step_all(self.envs, actions)
+        actions = numpy.asarray(actions)
+        workers = len(self.connections)
+        for shard in range(workers):
+            self.connections[shard].send(('step', actions[shard::workers]))
+        results = [connection.recv() for connection in self.connections]
+        observations = self.gather([result[0] for result in results])
+        rewards = numpy.concatenate([result[1] for result in results])[self.order]
+        dones = numpy.concatenate([result[2] for result in results])[self.order]
+        infos = []
+        for result in results:
+            infos.extend(result[3])
+        infos = [infos[i] for i in self.order]
+        return observations, rewards, dones, infos
+
+    def gather(self, shard_observations):
+        # Return the stacked observations of all the shards in env order
+        # - self is the VectorEnv
+        # - shard_observations is a list of stacked observations, one per shard
+        return {name: numpy.concatenate([observations[name] for observations in shard_observations])[self.order]
+                for name in OBSERVATION_NAMES}
+
+    def close(self):
+        # Stop the worker processes, if any
+        # - self is the VectorEnv
+        for connection in self.connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+ACTIONS = [None, pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT,
+           pygame.K_SPACE, pygame.K_x, pygame.K_c, pygame.K_v]
+ACTION_NAMES = ['noop', 'up', 'down', 'left', 'right', 'space', 'x', 'c', 'v']
+OBSERVATION_NAMES = ['player', 'enemies', 'enemy_bullets']
+POSITION_FIELDS = attrgetter('x', 'y', 'team')
+LEVEL_REWARD = 10  # reward for each level finished, on top of the enemies shot
+BACKENDS = {'game': treason.Game, 'array': treason.ArrayGame}
+
+
+if __name__ == '__main__':
+    main()